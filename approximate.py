@@ -0,0 +1,264 @@
+"""
+Approximate answers for the filter callback from a stratified sample
+
+``StratifiedSample`` keeps a uniform random sample of up to
+DASHBOARD_SAMPLE_PER_STRATUM raw transactions from every Region x
+Product_Category stratum, with each stratum's population, built in one pass
+over the source's tables (bottom-k by random key, so chunks merge exactly).
+``estimate`` answers the callback's roll-ups from it with the stratified
+estimators of totals, counts and means, each with a 95% confidence
+half-width, in a few milliseconds however large the history is.
+
+With DASHBOARD_APPROXIMATE=on, a filter change whose exact answer is not
+ready within DASHBOARD_APPROXIMATE_BUDGET_MS is answered with the estimate
+first; the exact computation carries on in a ``Refiner`` thread and a
+follow-up callback replaces the estimate with it.
+"""
+
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+from sales_table import CUBE_DIMENSIONS, SalesTable, from_days, rollup_frame
+from downsample import bucket_days
+from task_pool import FIGURE_WORKERS
+
+APPROXIMATE = os.environ.get('DASHBOARD_APPROXIMATE', 'off') == 'on'
+APPROXIMATE_BUDGET_MS = float(os.environ.get('DASHBOARD_APPROXIMATE_BUDGET_MS', 100))
+SAMPLE_PER_STRATUM = int(os.environ.get('DASHBOARD_SAMPLE_PER_STRATUM', 2000))
+STRATA = ['Region', 'Product_Category']
+# Two-sided 95% normal quantile
+Z_95 = 1.959963984540054
+# Estimated trends are bucketed by month: a sample has too few rows per day
+ESTIMATE_GRAIN = 'month'
+
+
+def _stratum_keys(table):
+    regions, categories = (len(table.dictionaries[column]) for column in STRATA)
+    return table.codes['Region'].astype(np.int64) * categories + table.codes['Product_Category'], \
+        regions * categories
+
+
+class StratifiedSample:
+    """Uniform sample of each Region x Product_Category stratum, with the stratum populations"""
+
+    def __init__(self, rows, population, version):
+        self.rows = rows
+        self.version = version
+        self.strata, size = _stratum_keys(rows)
+        self.population = population.astype(np.float64)
+        self.sampled = np.bincount(self.strata, minlength=size).astype(np.float64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, tables, version, per_stratum=SAMPLE_PER_STRATUM, seed=0):
+        """Sample an iterable of SalesTables, keeping the per_stratum rows with the smallest random keys"""
+        rng = np.random.default_rng(seed)
+        kept, kept_keys = None, None
+        population = Counter()
+        for table in tables:
+            table = SalesTable(table.day, table.sales,
+                               {column: table.codes[column] for column in CUBE_DIMENSIONS},
+                               {column: table.dictionaries[column] for column in CUBE_DIMENSIONS})
+            strata, _ = _stratum_keys(table)
+            categories = table.dictionaries['Product_Category']
+            for stratum, rows in enumerate(np.bincount(strata)):
+                if rows:
+                    region, category = divmod(stratum, len(categories))
+                    population[table.dictionaries['Region'][region], categories[category]] += int(rows)
+
+            keys = rng.random(len(table))
+            if kept is not None:
+                table, keys = SalesTable.concat([kept, table]), np.concatenate([kept_keys, keys])
+            strata, _ = _stratum_keys(table)
+            order = np.lexsort((keys, strata))
+            ordered = strata[order]
+            starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+            rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+            keep = np.sort(order[rank < per_stratum])
+            kept, kept_keys = table.take(keep), keys[keep]
+        if kept is None:
+            raise ValueError("Cannot sample an empty sales source")
+
+        regions, categories = (kept.dictionaries[column] for column in STRATA)
+        sizes = np.array([population[region, category] for region in regions for category in categories])
+        return cls(kept, sizes, version)
+
+    def _group_estimates(self, selected, groups, size):
+        """Totals, counts and means of the selected rows per group, with their variances"""
+        strata = self.strata[selected]
+        keys = strata * size + groups
+        shape = (len(self.sampled), size)
+        sales = self.rows.sales[selected]
+        sums = np.bincount(keys, weights=sales, minlength=shape[0] * size).reshape(shape)
+        squares = np.bincount(keys, weights=sales * sales, minlength=shape[0] * size).reshape(shape)
+        counts = np.bincount(keys, minlength=shape[0] * size).reshape(shape).astype(np.float64)
+
+        n = self.sampled[:, None]
+        N = self.population[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(n > 0, N / n, 0.0)
+            # Variance of a stratum total per unit of sample variance, with the
+            # finite population correction; a stratum sampled whole contributes none
+            scale = np.where(n > 1, N * N * (1 - n / N) / n, 0.0)
+
+            def sample_variance(total, total_squares):
+                return np.where(n > 1, (total_squares - total * total / n) / (n - 1), 0.0)
+
+            sales_total = (weight * sums).sum(axis=0)
+            count_total = (weight * counts).sum(axis=0)
+            sales_var = (scale * sample_variance(sums, squares)).sum(axis=0)
+            count_var = (scale * sample_variance(counts, counts)).sum(axis=0)
+            mean = np.where(count_total > 0, sales_total / count_total, 0.0)
+            # Linearized variance of the ratio estimator sum / count
+            residuals = sums - mean * counts
+            residual_squares = squares - 2 * mean * sums + mean * mean * counts
+            mean_var = np.where(count_total > 0,
+                                (scale * sample_variance(residuals, residual_squares)).sum(axis=0)
+                                / (count_total * count_total), 0.0)
+        return sales_total, count_total, mean, sales_var, count_var, mean_var, counts.sum(axis=0)
+
+    def estimate(self, start_day=None, end_day=None, equals=None):
+        """Estimated roll-ups of a selection, as SalesTable.aggregate returns, plus 95% half-widths
+
+        The 'Date' roll-up is by month. Each frame has the columns of
+        ``rollup_frame`` (Count is estimated, so fractional) plus 'Sales_Error',
+        'Count_Error' and 'Mean_Error'.
+        """
+        rows = self.rows
+        mask = np.ones(len(rows), dtype=bool)
+        if start_day is not None:
+            mask &= rows.day >= start_day
+        if end_day is not None:
+            mask &= rows.day <= end_day
+        for column, value in (equals or {}).items():
+            mask &= rows.codes[column] == rows.code(column, value)
+        selected = np.flatnonzero(mask)
+
+        months, month_index = np.unique(bucket_days(rows.day[selected], ESTIMATE_GRAIN), return_inverse=True)
+        groupings = {'Date': (month_index, len(months), from_days(months))}
+        for column in CUBE_DIMENSIONS:
+            groupings[column] = (rows.codes[column][selected].astype(np.int64),
+                                 len(rows.dictionaries[column]), rows.dictionaries[column])
+
+        frames = {}
+        for name, (groups, size, labels) in groupings.items():
+            sales, counts, mean, sales_var, count_var, mean_var, sampled = \
+                self._group_estimates(selected, groups, size)
+            # Groups with no sampled row are left out, as aggregate leaves out empty groups
+            present = sampled > 0
+            frame = rollup_frame(name, np.asarray(labels)[present], sales[present],
+                                 np.ones(int(present.sum())))
+            frame['Count'] = counts[present]
+            frame['Mean'] = mean[present]
+            frame['Sales_Error'] = Z_95 * np.sqrt(sales_var[present])
+            frame['Count_Error'] = Z_95 * np.sqrt(count_var[present])
+            frame['Mean_Error'] = Z_95 * np.sqrt(mean_var[present])
+            frames[name] = frame
+        return frames
+
+
+class BackgroundSample:
+    """The stratified sample of a sales source, rebuilt on a background thread when the data changes"""
+
+    def __init__(self, sales_source, per_stratum=SAMPLE_PER_STRATUM):
+        self.sales_source = sales_source
+        self.per_stratum = per_stratum
+        self._sample = None
+        self._building = None
+        self._lock = threading.Lock()
+
+    def _build(self, version):
+        try:
+            sample = StratifiedSample.build(self.sales_source.iter_tables(), version, self.per_stratum)
+        except Exception as e:
+            print(f"Could not build the approximate-query sample: {type(e).__name__}: {e}")
+        else:
+            self._sample = sample
+            print(f"Approximate-query sample: {len(sample):,} rows from "
+                  f"{int(sample.population.sum()):,} transactions")
+        finally:
+            with self._lock:
+                self._building = None
+
+    def current(self):
+        """The sample of the source's current data, or None while it is being (re)built"""
+        version = self.sales_source.version()
+        sample = self._sample
+        if sample is not None and sample.version == version:
+            return sample
+        with self._lock:
+            # A build thread does not survive a fork, so track which process started it
+            if self._building != (os.getpid(), version):
+                self._building = (os.getpid(), version)
+                threading.Thread(target=self._build, args=(version,), name='dashboard-sample',
+                                 daemon=True).start()
+        return None
+
+
+class Refiner:
+    """Exact computations started by requests that answered with an estimate
+
+    Computations run on DASHBOARD_FIGURE_WORKERS threads. The follow-up
+    request for the same key waits on the running computation instead of
+    starting another. A page (one browser tab) only waits for its latest
+    selection, so a newer key from the same page cancels the computation of
+    its previous one unless another page wants it too or it has started.
+    Another worker process, which does not share the pending computations,
+    simply computes it itself.
+    """
+
+    def __init__(self, workers=FIGURE_WORKERS):
+        self.workers = workers
+        self._pending = {}
+        self._latest = {}
+        self._wanted = {}
+        self._pool = None
+        self._pool_pid = None
+        # Reentrant: a future's done callback (_forget) runs in the thread that completes or
+        # cancels it, which may be holding the lock in submit
+        self._lock = threading.RLock()
+
+    def submit(self, key, function, *args, page=None):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dashboard-refine')
+                self._pool_pid = os.getpid()
+                self._pending, self._latest, self._wanted = {}, {}, {}
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(function, *args)
+                self._pending[key] = future
+                future.add_done_callback(lambda done: self._forget(key, done))
+            if page is not None:
+                previous = self._latest.get(page)
+                if previous is not None and previous != key:
+                    wanted = self._wanted.get(previous, set())
+                    wanted.discard(page)
+                    superseded = self._pending.get(previous)
+                    # Under the lock, so no other page can join the future between the
+                    # check and the cancel; a cancelled one is dropped from _pending at once
+                    if not wanted and superseded is not None:
+                        superseded.cancel()
+                self._latest[page] = key
+                self._wanted.setdefault(key, set()).add(page)
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+                for page in self._wanted.pop(key, ()):
+                    if self._latest.get(page) == key:
+                        del self._latest[page]
+
+    def result(self, key, function, *args):
+        """The exact result for key, joining a computation already running in this process"""
+        with metrics.span('refine'):
+            return self.submit(key, function, *args).result()
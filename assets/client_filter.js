@@ -0,0 +1,240 @@
+/*
+ * Client-side filtering (DASHBOARD_FILTER_MODE=client)
+ *
+ * The server ships the (day x region x category x segment) sales cube once, in
+ * the client-dataset store, and this callback rebuilds the trend, regional,
+ * category and segment charts and the regional table from it on every filter
+ * change. It mirrors build_dashboard_outputs in dashboard_advanced.py and
+ * resample_trend in downsample.py.
+ *
+ * Dataset layout: cells are sorted by day; the cells of day first_day + i are
+ * cell[day_starts[i]] .. cell[day_starts[i + 1] - 1], and each cell key packs
+ * the (region, category, segment) codes as (r * categories + c) * segments + s.
+ */
+(function () {
+    var DAY_MS = 86400000;
+    var GRAIN_DAYS = {day: 1, week: 7, month: 30.44};
+
+    function toDay(value) {
+        if (!value) {
+            return null;
+        }
+        var s = String(value);
+        return Date.UTC(+s.slice(0, 4), +s.slice(5, 7) - 1, +s.slice(8, 10)) / DAY_MS;
+    }
+
+    function dayString(day) {
+        return new Date(day * DAY_MS).toISOString().slice(0, 10);
+    }
+
+    function chooseGrain(spanDays, targetPoints) {
+        var grains = ['day', 'week', 'month'];
+        for (var i = 0; i < grains.length; i++) {
+            if (spanDays / GRAIN_DAYS[grains[i]] <= targetPoints) {
+                return grains[i];
+            }
+        }
+        return 'month';
+    }
+
+    function bucketDay(day, grain) {
+        if (grain === 'week') {
+            // Day 0 (1970-01-01) was a Thursday
+            return day - (((day + 3) % 7) + 7) % 7;
+        }
+        if (grain === 'month') {
+            var date = new Date(day * DAY_MS);
+            return Date.UTC(date.getUTCFullYear(), date.getUTCMonth(), 1) / DAY_MS;
+        }
+        return day;
+    }
+
+    function mean(values, start, end) {
+        var total = 0;
+        for (var i = start; i < end; i++) {
+            total += values[i];
+        }
+        return total / (end - start);
+    }
+
+    // Indexes of the points kept by Largest-Triangle-Three-Buckets downsampling
+    function lttb(x, y, threshold) {
+        var n = x.length;
+        var selected = [];
+        if (threshold >= n || threshold < 3) {
+            for (var k = 0; k < n; k++) {
+                selected.push(k);
+            }
+            return selected;
+        }
+        var every = (n - 2) / (threshold - 2);
+        var a = 0;
+        selected.push(0);
+        for (var i = 0; i < threshold - 2; i++) {
+            var nextStart = Math.floor((i + 1) * every) + 1;
+            var nextEnd = Math.min(Math.floor((i + 2) * every) + 1, n);
+            var avgX = mean(x, nextStart, nextEnd);
+            var avgY = mean(y, nextStart, nextEnd);
+            var start = Math.floor(i * every) + 1;
+            var end = Math.floor((i + 1) * every) + 1;
+            var best = start;
+            var bestArea = -1;
+            for (var j = start; j < end; j++) {
+                var area = Math.abs((x[a] - avgX) * (y[j] - y[a]) - (x[a] - x[j]) * (avgY - y[a]));
+                if (area > bestArea) {
+                    bestArea = area;
+                    best = j;
+                }
+            }
+            a = best;
+            selected.push(a);
+        }
+        selected.push(n - 1);
+        return selected;
+    }
+
+    function resampleTrend(days, sales, trend) {
+        var grain = trend.grain;
+        if (days.length === 0) {
+            return {days: days, sales: sales, grain: grain === 'auto' ? 'day' : grain};
+        }
+        if (grain === 'auto') {
+            grain = chooseGrain(days[days.length - 1] - days[0] + 1, trend.target_points);
+        }
+        if (grain !== 'day') {
+            var bucketed = [];
+            var sums = [];
+            for (var i = 0; i < days.length; i++) {
+                var bucket = bucketDay(days[i], grain);
+                if (bucketed.length && bucketed[bucketed.length - 1] === bucket) {
+                    sums[sums.length - 1] += sales[i];
+                } else {
+                    bucketed.push(bucket);
+                    sums.push(sales[i]);
+                }
+            }
+            days = bucketed;
+            sales = sums;
+        }
+        var keep = lttb(days, sales, trend.max_points);
+        return {
+            days: keep.map(function (i) { return days[i]; }),
+            sales: keep.map(function (i) { return sales[i]; }),
+            grain: grain
+        };
+    }
+
+    // Copy of a figure with new trace data, leaving the stored figure untouched
+    function withTraces(figure, update) {
+        var copy = Object.assign({}, figure);
+        copy.data = figure.data.map(function (trace) { return Object.assign({}, trace); });
+        copy.layout = Object.assign({}, figure.layout);
+        update(copy);
+        return copy;
+    }
+
+    function filterCharts(region, category, startDate, endDate, dataset,
+                          trendFigure, regionalFigure, categoryFigure, segmentFigure) {
+        var labels = dataset.labels;
+        var nRegions = labels.Region.length;
+        var nCategories = labels.Product_Category.length;
+        var nSegments = labels.Customer_Segment.length;
+        var regionCode = region === 'all' ? -1 : labels.Region.indexOf(region);
+        var categoryCode = category === 'all' ? -1 : labels.Product_Category.indexOf(category);
+        var nDays = dataset.day_starts.length - 1;
+
+        var startDay = toDay(startDate);
+        var endDay = toDay(endDate);
+        var first = startDay === null ? 0 : Math.max(startDay - dataset.first_day, 0);
+        var last = endDay === null ? nDays - 1 : Math.min(endDay - dataset.first_day, nDays - 1);
+
+        var regionSales = new Float64Array(nRegions), regionCounts = new Float64Array(nRegions);
+        var categorySales = new Float64Array(nCategories), categoryCounts = new Float64Array(nCategories);
+        var segmentSales = new Float64Array(nSegments), segmentCounts = new Float64Array(nSegments);
+        var trendDays = [], trendSales = [];
+        var matched = (regionCode === -1 || regionCode >= 0) && (categoryCode === -1 || categoryCode >= 0);
+
+        for (var d = first; matched && d <= last; d++) {
+            var daySales = 0, dayCount = 0;
+            for (var i = dataset.day_starts[d]; i < dataset.day_starts[d + 1]; i++) {
+                var cell = dataset.cell[i];
+                var s = cell % nSegments;
+                var c = Math.floor(cell / nSegments) % nCategories;
+                var r = Math.floor(cell / (nSegments * nCategories));
+                if ((regionCode !== -1 && r !== regionCode) || (categoryCode !== -1 && c !== categoryCode)) {
+                    continue;
+                }
+                var sales = dataset.sales[i], count = dataset.count[i];
+                daySales += sales;
+                dayCount += count;
+                regionSales[r] += sales;
+                regionCounts[r] += count;
+                categorySales[c] += sales;
+                categoryCounts[c] += count;
+                segmentSales[s] += sales;
+                segmentCounts[s] += count;
+            }
+            if (dayCount > 0) {
+                trendDays.push(dataset.first_day + d);
+                trendSales.push(daySales);
+            }
+        }
+
+        var trend = resampleTrend(trendDays, trendSales, dataset.trend);
+        var newTrend = withTraces(trendFigure, function (figure) {
+            figure.data[0].x = trend.days.map(dayString);
+            figure.data[0].y = trend.sales;
+            figure.layout.title = Object.assign({}, figure.layout.title, {text: dataset.trend.titles[trend.grain]});
+        });
+
+        var regions = [], regionTotals = [], table = [];
+        for (r = 0; r < nRegions; r++) {
+            if (regionCounts[r] > 0) {
+                regions.push(labels.Region[r]);
+                regionTotals.push(regionSales[r]);
+                table.push({
+                    Region: labels.Region[r],
+                    Total_Sales: Math.round(regionSales[r]),
+                    Avg_Transaction: Math.round(regionSales[r] / regionCounts[r]),
+                    Customer_Count: regionCounts[r]
+                });
+            }
+        }
+        table.sort(function (x, y) { return y.Total_Sales - x.Total_Sales; });
+        var newRegional = withTraces(regionalFigure, function (figure) {
+            figure.data[0].x = regions;
+            figure.data[0].y = regionTotals;
+            figure.data[0].marker = Object.assign({}, figure.data[0].marker, {color: regionTotals});
+        });
+
+        var categories = [], categoryTotals = [];
+        for (c = 0; c < nCategories; c++) {
+            if (categoryCounts[c] > 0) {
+                categories.push(labels.Product_Category[c]);
+                categoryTotals.push(categorySales[c]);
+            }
+        }
+        var newCategory = withTraces(categoryFigure, function (figure) {
+            figure.data[0].labels = categories;
+            figure.data[0].values = categoryTotals;
+        });
+
+        // One trace per segment, in the order the server built them
+        var newSegment = withTraces(segmentFigure, function (figure) {
+            dataset.segment_traces.forEach(function (segment, index) {
+                var code = labels.Customer_Segment.indexOf(segment);
+                var present = code >= 0 && segmentCounts[code] > 0;
+                figure.data[index].x = present ? [segment] : [];
+                figure.data[index].y = present ? [segmentSales[code]] : [];
+            });
+        });
+
+        return [newTrend, newRegional, newCategory, newSegment, table];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: Object.assign({}, (window.dash_clientside || {}).dashboard, {
+            filterCharts: filterCharts
+        })
+    });
+})();
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the dashboard data path
+
+For each data scale it generates a dataset with data_generator.py (reused on
+later runs), then starts the dashboard twice in a fresh process: once with an
+empty cache (cold start) and once with the cache built (warm start). The warm
+process also times every stage of the filter callback over a matrix of
+region, category and date-range selections:
+
+    filter     cube cells for the date range and region/category
+    aggregate  the fused per-day/per-dimension roll-up pass
+    figure_*   building each figure patch and the regional table
+    serialize  JSON encoding of the callback outputs
+    total      all of the above, i.e. an uncached update_dashboard
+    cached     a repeated update_dashboard served by the result cache
+
+The response size of each callback output is also measured for the full
+selection in every payload encoding (plain plotly JSON, compact text, typed
+arrays), raw and compressed.
+
+Results (latency percentiles in ms, startup seconds, peak RSS, payload
+bytes) are written as JSON. With --baseline, the run is compared with an earlier results file
+and the exit status is 1 if any p50 latency, startup time or peak memory
+regressed by more than --threshold.
+
+    python benchmark.py --scales 10k,1M,10M --output results.json
+    python benchmark.py --baseline baseline.json
+    python benchmark.py --compare results.json --baseline baseline.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import data_generator
+
+REPO_DIR = Path(__file__).resolve().parent
+DEFAULT_SCALES = '10k,1M,10M'
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 0.10
+PERCENTILES = [50, 95, 99]
+# update_dashboard outputs, in callback order
+PAYLOAD_OUTPUTS = ['trend', 'regional', 'category', 'segment', 'table']
+
+# Selections timed at every scale: date ranges are counted back from the last day
+DATE_RANGES = {'full': None, 'quarter': 90, 'month': 30}
+
+
+def summarize_timings(samples):
+    """Percentiles, mean and max of a list of durations in seconds, reported in ms"""
+    values = np.asarray(samples) * 1000
+    summary = {f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary.update(mean_ms=float(values.mean()), max_ms=float(values.max()), n=len(values))
+    return summary
+
+
+def prepare_dataset(root, scale, seed):
+    """Generate the dataset for a scale unless a matching one exists; returns its directory"""
+    rows = data_generator.parse_count(scale)
+    directory = Path(root) / scale
+    marker = directory / 'dataset.json'
+    spec = {'rows': rows, 'seed': seed}
+    try:
+        if json.loads(marker.read_text()) == spec:
+            return directory
+    except (OSError, ValueError):
+        pass
+
+    print(f"Generating {scale} dataset in {directory}...")
+    shutil.rmtree(directory, ignore_errors=True)
+    data_generator.generate_business_data(rows, seed=seed, output_dir=str(directory))
+    marker.write_text(json.dumps(spec))
+    return directory
+
+
+def time_stages(dashboard, repeats):
+    """Time every stage of the filter callback over the selection matrix"""
+    from plotly.io.json import to_json_plotly
+    from process_stats import peak_rss_mb
+    from sales_table import CUBE_DIMENSIONS, from_days
+
+    summary = dashboard.sales_source.summary
+    regions = ['all', summary['labels']['Region'][0]]
+    categories = ['all', summary['labels']['Product_Category'][0]]
+    last_day = summary['last_day']
+    selections = []
+    for region, category, (range_name, days) in itertools.product(regions, categories, DATE_RANGES.items()):
+        start_day = summary['first_day'] if days is None else last_day - days + 1
+        start_date, end_date = (str(day)[:10] for day in from_days([start_day, last_day]))
+        selections.append((region, category, start_date, end_date))
+
+    figure_builders = [
+        ('figure_trend', dashboard.patch_trend_figure, 'Date'),
+        ('figure_regional', dashboard.patch_regional_figure, 'Region'),
+        ('figure_category', dashboard.patch_category_figure, 'Product_Category'),
+        ('figure_segment', dashboard.patch_segment_figure, 'Customer_Segment'),
+        ('table_regional', dashboard.build_regional_table, 'Region'),
+    ]
+    timings = defaultdict(list)
+    response_bytes = []
+    for _ in range(repeats):
+        for selection in selections:
+            region, category, start_day, end_day = dashboard.normalize_filters(*selection)
+            equals = {}
+            if region != 'all':
+                equals['Region'] = region
+            if category != 'all':
+                equals['Product_Category'] = category
+
+            started = time.perf_counter()
+            if dashboard.query_backend.name == 'cube':
+                filtered = dashboard.sales_source.cube(start_day, end_day).select(start_day, end_day, equals)
+                timings['filter'].append(time.perf_counter() - started)
+
+                stage_started = time.perf_counter()
+                rollups = filtered.aggregate(CUBE_DIMENSIONS)
+                timings['aggregate'].append(time.perf_counter() - stage_started)
+            else:
+                # SQL backends filter and aggregate in one pushed-down query
+                rollups = dashboard.query_backend.rollups(start_day, end_day, equals)
+                timings['query'].append(time.perf_counter() - started)
+
+            outputs = []
+            for name, build, rollup in figure_builders:
+                stage_started = time.perf_counter()
+                outputs.append(build(rollups[rollup]))
+                timings[name].append(time.perf_counter() - stage_started)
+
+            stage_started = time.perf_counter()
+            payload = to_json_plotly(outputs)
+            timings['serialize'].append(time.perf_counter() - stage_started)
+            timings['total'].append(time.perf_counter() - started)
+            response_bytes.append(len(payload))
+
+            # The same work as the callback does it, on the figure pool when that is enabled
+            stage_started = time.perf_counter()
+            dashboard.build_dashboard_outputs(region, category, start_day, end_day)
+            timings['outputs'].append(time.perf_counter() - stage_started)
+
+            stage_started = time.perf_counter()
+            for board in dashboard.leaderboards.values():
+                board.top(start_day, end_day, equals)
+            timings['leaderboards'].append(time.perf_counter() - stage_started)
+
+            # Second call of the real callback is answered by the result cache
+            dashboard.update_dashboard(*selection, None)
+            stage_started = time.perf_counter()
+            dashboard.update_dashboard(*selection, None)
+            timings['cached'].append(time.perf_counter() - stage_started)
+
+    return {
+        'selections': len(selections),
+        'stages': {name: summarize_timings(samples) for name, samples in timings.items()},
+        'response_bytes': {'mean': float(np.mean(response_bytes)), 'max': int(np.max(response_bytes))},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure_payloads(dashboard):
+    """Bytes of each callback output for the full selection, per payload encoding, raw and compressed"""
+    import payload
+    from plotly.io.json import to_json_plotly
+
+    filters = dashboard.normalize_filters('all', 'all', None, None)
+    encodings = {'plain': (False, False), 'compact': (True, False), 'typed': (True, True)}
+    sizes = defaultdict(dict)
+    saved = payload.COMPACT_PAYLOADS, payload.USE_TYPED_ARRAYS
+    try:
+        for encoding, (payload.COMPACT_PAYLOADS, payload.USE_TYPED_ARRAYS) in encodings.items():
+            outputs, _ = dashboard.build_dashboard_outputs(*filters)
+            for name, output in zip(PAYLOAD_OUTPUTS, outputs):
+                if hasattr(output, 'to_plotly_json'):
+                    output = output.to_plotly_json()
+                body = to_json_plotly(output).encode()
+                sizes[name][encoding] = len(body)
+                sizes[name][f"{encoding}_gzip"] = len(payload.compress(body, 'gzip'))
+                if payload.brotli is not None:
+                    sizes[name][f"{encoding}_br"] = len(payload.compress(body, 'br'))
+    finally:
+        payload.COMPACT_PAYLOADS, payload.USE_TYPED_ARRAYS = saved
+    return dict(sizes)
+
+
+def run_child(data_dir, repeats, output):
+    """Start the dashboard in data_dir, time startup and (if repeats) the callback stages"""
+    os.chdir(data_dir)
+    started = time.perf_counter()
+    import dashboard_advanced as dashboard
+    from process_stats import peak_rss_mb
+    result = {'import_s': time.perf_counter() - started}
+    # The data loads on a background thread started by the import
+    dashboard.wait_until_ready()
+    result.update(ready_s=time.perf_counter() - started, startup_peak_rss_mb=peak_rss_mb(),
+                  transactions=dashboard.sales_source.summary['transactions'])
+
+    started = time.perf_counter()
+    dashboard.load_data()
+    result['load_data_s'] = time.perf_counter() - started
+    if repeats:
+        result.update(time_stages(dashboard, repeats))
+        result['payload_bytes'] = measure_payloads(dashboard)
+    Path(output).write_text(json.dumps(result))
+
+
+def run_scale(data_dir, repeats):
+    """Cold and warm start of the dashboard on one dataset, each in a fresh process"""
+    results = {}
+    for phase, phase_repeats in [('cold', 0), ('warm', repeats)]:
+        if phase == 'cold':
+            shutil.rmtree(data_dir / '.dashboard_cache', ignore_errors=True)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            output = f.name
+        try:
+            subprocess.run([sys.executable, str(Path(__file__).resolve()), '--child', str(data_dir),
+                            '--repeats', str(phase_repeats), '--child-output', output],
+                           check=True, stdout=subprocess.DEVNULL)
+            results[phase] = json.loads(Path(output).read_text())
+        finally:
+            os.remove(output)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every shared metric against the baseline; returns the regressions"""
+    regressions = []
+    for scale, current in results['scales'].items():
+        previous = baseline['scales'].get(scale)
+        if previous is None:
+            continue
+        metrics = [(f"{phase} {key}", current[phase].get(key), previous[phase].get(key))
+                   for phase in ('cold', 'warm')
+                   for key in ('import_s', 'ready_s', 'load_data_s', 'startup_peak_rss_mb')]
+        metrics += [(f"{stage} p50_ms", summary['p50_ms'],
+                     previous['warm'].get('stages', {}).get(stage, {}).get('p50_ms'))
+                    for stage, summary in current['warm'].get('stages', {}).items()]
+        metrics.append(('peak_rss_mb', current['warm'].get('peak_rss_mb'),
+                        previous['warm'].get('peak_rss_mb')))
+
+        print(f"\n{scale}: current vs baseline")
+        for name, value, base in metrics:
+            if value is None or not base:
+                continue
+            change = value / base - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((scale, name, change))
+            print(f"  {name:<32} {value:>10.2f} {base:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def print_results(results):
+    for scale, result in results['scales'].items():
+        warm = result['warm']
+        print(f"\n{scale} ({warm['transactions']:,} transactions)")
+        print(f"  cold start {result['cold']['ready_s']:.2f}s, warm start {warm['ready_s']:.2f}s, "
+              f"peak RSS {warm.get('peak_rss_mb') or 0:,.0f} MB")
+        for stage, summary in warm.get('stages', {}).items():
+            print(f"  {stage:<16} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                  f"p99 {summary['p99_ms']:8.2f} ms")
+        if warm.get('payload_bytes'):
+            print(f"  {'payload bytes':<16} {'plain':>8} {'compact':>8} {'typed':>8} "
+                  f"{'plain gz':>9} {'compact gz':>11}")
+            for name, sizes in warm['payload_bytes'].items():
+                print(f"  {name:<16} {sizes['plain']:>8,} {sizes['compact']:>8,} {sizes['typed']:>8,} "
+                      f"{sizes['plain_gzip']:>9,} {sizes['compact_gzip']:>11,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard load and callback stages")
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help="comma-separated sales row counts, e.g. 10k,1M,10M")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help="passes over the selection matrix per scale")
+    parser.add_argument('--data-root', default='.benchmark', help="where generated datasets are kept")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--compare', help="compare this results file with --baseline without running")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--child-output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(REPO_DIR))
+        run_child(args.child, args.repeats, args.child_output)
+        return
+
+    if args.compare:
+        results = json.loads(Path(args.compare).read_text())
+    else:
+        results = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'repeats': args.repeats,
+            },
+            'scales': {},
+        }
+        for scale in args.scales.split(','):
+            data_dir = prepare_dataset(args.data_root, scale.strip(), args.seed).resolve()
+            print(f"Benchmarking {scale}...")
+            results['scales'][scale] = run_scale(data_dir, args.repeats)
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print_results(results)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
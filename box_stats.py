@@ -0,0 +1,101 @@
+"""
+Server-side box plot statistics
+
+Computes the quartiles, whisker fences, mean and a capped outlier sample of a
+column so box plots can be drawn from a handful of numbers instead of shipping
+every raw value to the browser. Columns larger than ``EXACT_QUANTILE_LIMIT``
+are summarized in bounded-size chunks with histogram-based quantiles.
+"""
+
+import numpy as np
+
+EXACT_QUANTILE_LIMIT = 1_000_000
+HISTOGRAM_BINS = 4096
+CHUNK_SIZE = 1_000_000
+MAX_OUTLIERS = 50
+
+
+def _chunks(values, chunk_size):
+    for start in range(0, len(values), chunk_size):
+        chunk = np.asarray(values[start:start + chunk_size], dtype=np.float64)
+        yield chunk[~np.isnan(chunk)]
+
+
+def histogram_quantiles(values, quantiles, bins=HISTOGRAM_BINS, chunk_size=CHUNK_SIZE):
+    """Approximate quantiles from a fixed-bin histogram built one chunk at a time
+
+    The error is at most one bin width, (max - min) / bins.
+    """
+    lo, hi = np.inf, -np.inf
+    for chunk in _chunks(values, chunk_size):
+        if len(chunk):
+            lo, hi = min(lo, chunk.min()), max(hi, chunk.max())
+    if lo > hi:
+        return [np.nan] * len(quantiles)
+    if lo == hi:
+        return [lo] * len(quantiles)
+
+    edges = np.linspace(lo, hi, bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    for chunk in _chunks(values, chunk_size):
+        counts += np.histogram(chunk, bins=edges)[0]
+
+    # Interpolate linearly inside the bin holding each target rank
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    results = []
+    for q in quantiles:
+        rank = q * (total - 1)
+        index = min(int(np.searchsorted(cumulative, rank, side='right')), bins - 1)
+        before = cumulative[index - 1] if index else 0
+        fraction = (rank - before + 0.5) / counts[index] if counts[index] else 0.0
+        results.append(edges[index] + min(max(fraction, 0.0), 1.0) * (edges[index + 1] - edges[index]))
+    return results
+
+
+def box_statistics(values, max_outliers=MAX_OUTLIERS, exact_limit=EXACT_QUANTILE_LIMIT,
+                   chunk_size=CHUNK_SIZE, seed=0):
+    """Summarize a column for a box plot
+
+    Returns a dict with q1, median, q3, lowerfence, upperfence (the most extreme
+    values within 1.5 IQR of the box), mean, count, outlier_count and a random
+    sample of at most ``max_outliers`` outliers.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) <= exact_limit:
+        finite = values[~np.isnan(values)]
+        if len(finite) == 0:
+            return None
+        q1, median, q3 = np.percentile(finite, [25, 50, 75])
+    else:
+        q1, median, q3 = histogram_quantiles(values, [0.25, 0.5, 0.75], chunk_size=chunk_size)
+        if np.isnan(median):
+            return None
+
+    low_limit, high_limit = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    rng = np.random.default_rng(seed)
+    lowerfence, upperfence = np.inf, -np.inf
+    total, count, outlier_count = 0.0, 0, 0
+    # Keep the outliers with the smallest random keys: a uniform sample across chunks
+    sample, sample_keys = np.empty(0), np.empty(0)
+    for chunk in _chunks(values, chunk_size):
+        total += chunk.sum()
+        count += len(chunk)
+        inside = chunk[(chunk >= low_limit) & (chunk <= high_limit)]
+        if len(inside):
+            lowerfence, upperfence = min(lowerfence, inside.min()), max(upperfence, inside.max())
+        outliers = chunk[(chunk < low_limit) | (chunk > high_limit)]
+        outlier_count += len(outliers)
+        if len(outliers) and max_outliers:
+            sample = np.concatenate([sample, outliers])
+            sample_keys = np.concatenate([sample_keys, rng.random(len(outliers))])
+            if len(sample) > max_outliers:
+                keep = np.argpartition(sample_keys, max_outliers)[:max_outliers]
+                sample, sample_keys = sample[keep], sample_keys[keep]
+
+    return {
+        'q1': float(q1), 'median': float(median), 'q3': float(q3),
+        'lowerfence': float(lowerfence), 'upperfence': float(upperfence),
+        'mean': total / count, 'count': count,
+        'outlier_count': outlier_count, 'outliers': np.sort(sample),
+    }
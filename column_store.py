@@ -0,0 +1,135 @@
+"""
+Memory-mapped column store
+
+A table is saved as one .npy file per column plus a small JSON index holding
+the column names and the labels of the dictionary-encoded columns. Opening a
+store maps every column read-only, so it costs no parsing, and all worker
+processes opening the same store share one copy of the data through the OS
+page cache instead of each holding a private one.
+
+Stores live in the cache directory, one per version of their source file
+(``<stem><kind>.columns/<version>/``). A source that changes gets a fresh
+store and the older versions are removed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_store import CACHE_DIR, cache_stem, parse_csv, source_signature
+
+INDEX_FILE = 'columns.json'
+
+
+def write_store(directory, arrays, dictionaries):
+    """Save arrays (name -> 1-d array) and dictionaries (name -> labels) as a store
+
+    The store is assembled under a temporary name and renamed into place, so
+    readers never see a partial store.
+    """
+    tmp_directory = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+        for position, array in enumerate(arrays.values()):
+            np.save(os.path.join(tmp_directory, f"{position:03d}.npy"), np.ascontiguousarray(array))
+        index = {
+            'columns': list(arrays),
+            'dictionaries': {name: pd.Index(labels).tolist() for name, labels in dictionaries.items()},
+        }
+        with open(os.path.join(tmp_directory, INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Another worker finished the same store first
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def read_store(directory):
+    """Open a store, returning (arrays memory-mapped read-only, dictionaries)"""
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f"{position:03d}.npy"), mmap_mode='r')
+              for position, name in enumerate(index['columns'])}
+    return arrays, index['dictionaries']
+
+
+def _remove_other_versions(root, version):
+    for name in os.listdir(root):
+        # Skip the current store and stores other workers are still writing
+        if name != version and not name.endswith('.tmp'):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def read_cached_columns(path, build, params, kind='', cache_dir=CACHE_DIR, signature=None):
+    """Return the (arrays, dictionaries) produced by build(), memory-mapped from a store
+
+    The store is rebuilt whenever the source file or params change. A build
+    that reads only part of a growing file passes the signature of that part.
+    If the store cannot be written, the freshly built in-memory arrays are returned.
+    """
+    expected = {'source': signature or source_signature(path), **params}
+    version = hashlib.sha1(json.dumps(expected, sort_keys=True).encode()).hexdigest()[:16]
+    root = os.path.join(cache_dir, f"{cache_stem(path)}{kind}.columns")
+    directory = os.path.join(root, version)
+
+    if os.path.isdir(directory):
+        try:
+            return read_store(directory)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable column store {directory}: {e}")
+
+    arrays, dictionaries = build()
+    try:
+        os.makedirs(root, exist_ok=True)
+        write_store(directory, arrays, dictionaries)
+        _remove_other_versions(root, version)
+        # Serve the mapped copy so the pages are shared rather than private
+        return read_store(directory)
+    except OSError as e:
+        print(f"Could not write column store for {path}: {e}")
+        return arrays, dictionaries
+
+
+def frame_to_columns(frame):
+    """Split a DataFrame into store arrays; string and categorical columns are dictionary encoded"""
+    arrays, dictionaries = {}, {}
+    for column in frame.columns:
+        values = frame[column]
+        if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+            categorical = values.astype('category')
+            arrays[column] = categorical.cat.codes.to_numpy()
+            dictionaries[column] = categorical.cat.categories
+        else:
+            arrays[column] = values.to_numpy()
+    return arrays, dictionaries
+
+
+def columns_to_frame(arrays, dictionaries):
+    """Build a DataFrame over store arrays without copying them"""
+    columns = {column: pd.Categorical.from_codes(array, dictionaries[column])
+               if column in dictionaries else array
+               for column, array in arrays.items()}
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_mapped_csv(path, date_columns=(), categorical_columns=(), cache_dir=CACHE_DIR):
+    """Read a CSV as a DataFrame memory-mapped from its column store
+
+    String columns come back as categoricals. Raises FileNotFoundError if the
+    source CSV does not exist.
+    """
+    params = {
+        'date_columns': list(date_columns),
+        'categorical_columns': list(categorical_columns),
+    }
+    build = lambda: frame_to_columns(parse_csv(path, date_columns, categorical_columns))
+    return columns_to_frame(*read_cached_columns(path, build, params, cache_dir=cache_dir))
@@ -0,0 +1,7 @@
+"""pytest setup: keep the column stores and databases tests build out of the working tree"""
+
+import os
+import tempfile
+
+# Read when data_store is imported, so set before any test module imports it
+os.environ.setdefault('DASHBOARD_CACHE_DIR', tempfile.mkdtemp(prefix='dashboard-test-cache-'))
@@ -1,17 +1,62 @@
+import time
+startup_started = time.perf_counter()
+
 import dash
-from dash import dcc, html, Input, Output, dash_table, callback
-import plotly.express as px
+from dash import dcc, html, Input, Output, State, Patch, dash_table, no_update, ClientsideFunction
+from dash.exceptions import PreventUpdate
+from flask import Response, request, stream_with_context
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from plotly.io.json import to_json_plotly
 import pandas as pd
 import numpy as np
 import json
 import os
-from datetime import datetime, timedelta
+import threading
+import traceback
+import uuid
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from functools import partial
+
+import approximate
+import data_generator
+import export
+import metrics
+import payload
+import task_pool
+from box_stats import box_statistics
+from column_store import read_mapped_csv
+from downsample import TREND_GRAIN, TREND_MAX_POINTS, TREND_TARGET_POINTS, resample_trend
+from leaderboard import LEADERBOARD_COLUMNS, LEADERBOARD_SIZE, build_leaderboards
+from result_cache import ResultCache
+from process_stats import peak_rss_mb
+from query_backend import open_query_backend
+from sales_source import MEMORY_BUDGET_MB, InMemorySales, PartitionedSales, open_sales_csv
+from sales_table import CUBE_DIMENSIONS, SalesTable, from_days, to_day
+
+# 'summary' draws the satisfaction box plot from server-side statistics,
+# 'points' sends every raw score to the browser
+BOX_PLOT_MODE = os.environ.get('DASHBOARD_BOX_PLOT_MODE', 'summary')
+
+# Seconds between checks for sales rows appended to the data files; 0 disables live updates
+LIVE_REFRESH_SECONDS = float(os.environ.get('DASHBOARD_LIVE_REFRESH_SECONDS', 5))
 
-# Initialize the Dash app
-app = dash.Dash(__name__)
+# 'server' answers filter changes with update_dashboard; 'client' ships the sales cube to the
+# browser once and filters it there (assets/client_filter.js), for cubes of at most
+# CLIENT_MAX_CELLS (day, region, category, segment) cells
+FILTER_MODE = os.environ.get('DASHBOARD_FILTER_MODE', 'server')
+CLIENT_MAX_CELLS = int(os.environ.get('DASHBOARD_CLIENT_MAX_CELLS', 500_000))
+
+# Initialize the Dash app. The layout is a function that serves a loading page until
+# the data is in, so callbacks target components the first layout does not contain
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Business Intelligence Dashboard"
+# WSGI app; production servers that fork workers take it from create_server(), below
+server = app.server
+# Server-Timing headers on every response and Prometheus metrics at /metrics
+metrics.instrument(server)
+# gzip/brotli for callback responses, the layout and the component bundles
+payload.compress_responses(server)
 
 # Custom CSS styling
 app.index_string = '''
@@ -47,6 +92,16 @@ app.index_string = '''
                 opacity: 0.9;
                 margin: 5px 0 0 0;
             }
+            .estimate-status {
+                color: #7f8c8d;
+                font-style: italic;
+                text-align: center;
+                min-height: 1.2em;
+            }
+            .export-links {
+                text-align: right;
+                margin: -10px 0 10px 0;
+            }
             .filter-container {
                 background: white;
                 padding: 20px;
@@ -74,19 +129,30 @@ app.index_string = '''
 </html>
 '''
 
+# Month-partitioned sales (written by data_generator.py --partition-by month)
+# take precedence over a single sales_data.csv
+SALES_PARTITION_DIR = 'sales_data'
+
 # Load or generate data
 def load_data():
     try:
-        # Try to load existing data
-        sales_data = pd.read_csv('sales_data.csv')
-        customer_data = pd.read_csv('customer_data.csv')
-        product_data = pd.read_csv('product_data.csv')
-        
-        # Convert date columns
-        sales_data['Date'] = pd.to_datetime(sales_data['Date'])
-        customer_data['Join_Date'] = pd.to_datetime(customer_data['Join_Date'])
-        customer_data['Last_Purchase'] = pd.to_datetime(customer_data['Last_Purchase'])
-        product_data['Launch_Date'] = pd.to_datetime(product_data['Launch_Date'])
+        # Try to load existing data (memory-mapped from the column store after the first run,
+        # so worker processes share one copy of the pages).
+        # Sales are kept in the compact integer-coded layout behind a sales source;
+        # partitions are only read for the months a query touches, and a single file
+        # too large for the memory budget is streamed into the cube in chunks
+        if os.path.isdir(SALES_PARTITION_DIR):
+            sales_source = PartitionedSales(SALES_PARTITION_DIR)
+        else:
+            sales_source = open_sales_csv('sales_data.csv')
+        customer_data = read_mapped_csv(
+            'customer_data.csv',
+            date_columns=['Join_Date', 'Last_Purchase'],
+            categorical_columns=['Gender', 'Region', 'Customer_Segment'])
+        product_data = read_mapped_csv(
+            'product_data.csv',
+            date_columns=['Launch_Date'],
+            categorical_columns=['Category'])
         
         print("Loaded existing data files")
         
@@ -94,312 +160,50 @@ def load_data():
         # Generate sample data if files don't exist
         print("Generating sample data...")
         
-        np.random.seed(42)
-        dates = pd.date_range(start='2023-01-01', end='2024-12-31', freq='D')
-        
-        # Generate more realistic sales data
-        sales_records = []
-        for date in dates:
-            daily_transactions = np.random.randint(20, 100)
-            for _ in range(daily_transactions):
-                sales_records.append({
-                    'Date': date,
-                    'Sales': np.random.lognormal(8, 0.8),
-                    'Region': np.random.choice(['North', 'South', 'East', 'West'], p=[0.3, 0.25, 0.25, 0.2]),
-                    'Product_Category': np.random.choice(['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Books']),
-                    'Customer_Segment': np.random.choice(['Premium', 'Standard', 'Budget'], p=[0.25, 0.5, 0.25]),
-                    'Channel': np.random.choice(['Online', 'Retail', 'Partner'], p=[0.6, 0.3, 0.1])
-                })
-        
-        sales_data = pd.DataFrame(sales_records)
-        
-        # Customer data
-        num_customers = 2000
-        customer_data = pd.DataFrame({
-            'Customer_ID': [f"CUST_{i:05d}" for i in range(1, num_customers + 1)],
-            'Age': np.random.normal(40, 15, num_customers).clip(18, 80).astype(int),
-            'Gender': np.random.choice(['Male', 'Female'], num_customers),
-            'Total_Purchases': np.random.exponential(5, num_customers),
-            'Satisfaction_Score': np.random.normal(7, 1.5, num_customers).clip(1, 10),
-            'Region': np.random.choice(['North', 'South', 'East', 'West'], num_customers),
-            'Customer_Segment': np.random.choice(['Premium', 'Standard', 'Budget'], num_customers, p=[0.25, 0.5, 0.25])
-        })
-        
-        # Product data
-        product_names = ['Smartphone Pro', 'Laptop Ultra', 'Wireless Headphones', 'Smart Watch', 'Gaming Console',
-                        'Designer Jacket', 'Running Shoes', 'Casual Shirt', 'Premium Jeans', 'Winter Coat',
-                        'Garden Tool Set', 'Kitchen Mixer', 'Coffee Maker', 'LED TV', 'Bluetooth Speaker']
-        
-        product_data = pd.DataFrame({
-            'Product': product_names,
-            'Category': ['Electronics'] * 5 + ['Clothing'] * 5 + ['Home & Garden'] * 5,
-            'Revenue': np.random.uniform(50000, 300000, len(product_names)),
-            'Units_Sold': np.random.randint(100, 2000, len(product_names)),
-            'Profit_Margin': np.random.uniform(0.1, 0.5, len(product_names)),
-            'Customer_Rating': np.random.uniform(3.5, 5.0, len(product_names))
-        })
+        sales_data = pd.concat(data_generator.generate_sales_chunks(), ignore_index=True)
+        sales_source = InMemorySales(SalesTable.from_frame(sales_data))
+        customer_data = pd.concat(data_generator.generate_customer_chunks(), ignore_index=True)
+        product_data = data_generator.generate_product_data()
     
-    return sales_data, customer_data, product_data
+    return sales_source, customer_data, product_data
 
-# Load the data
-sales_data, customer_data, product_data = load_data()
+# Callback results are cached per dataset version; a new version drops older entries
+result_cache = ResultCache()
+# Bump RESULTS_FORMAT whenever the shape of the callback outputs changes
+RESULTS_FORMAT = f"patch-v3-{payload.PAYLOAD_FORMAT}{'-approx' if approximate.APPROXIMATE else ''}"
+metrics.add_collector('dashboard_result_cache_total', 'counter',
+                      "Result cache lookups and evictions by outcome", 'outcome',
+                      lambda: dict(result_cache.stats))
+# Load plotly's lazily imported JSON engine now, before request threads start: threads
+# importing it at the same time can get a partially initialized module
+to_json_plotly({})
 
-# Calculate key metrics
-total_revenue = sales_data['Sales'].sum()
-total_customers = len(customer_data)
-avg_satisfaction = customer_data['Satisfaction_Score'].mean()
-avg_profit_margin = product_data['Profit_Margin'].mean()
+# Figure builders
+TREND_TITLES = {'day': 'Sales Trend Over Time', 'week': 'Weekly Sales Trend',
+                'month': 'Monthly Sales Trend'}
 
-# Define the layout
-app.layout = html.Div([
-    # Header
-    html.Div([
-        html.H1("Business Intelligence Dashboard", 
-                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '10px', 'fontSize': '3em'}),
-        html.P("Real-time Analytics & Insights", 
-               style={'textAlign': 'center', 'color': '#7f8c8d', 'fontSize': '1.2em', 'marginBottom': '30px'})
-    ]),
-    
-    # Key Metrics Row
-    html.Div([
-        html.Div([
-            html.H2(f"${total_revenue:,.0f}", className='metric-value'),
-            html.P("Total Revenue", className='metric-label')
-        ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
-        
-        html.Div([
-            html.H2(f"{total_customers:,}", className='metric-value'),
-            html.P("Active Customers", className='metric-label')
-        ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
-        
-        html.Div([
-            html.H2(f"{avg_satisfaction:.1f}/10", className='metric-value'),
-            html.P("Customer Satisfaction", className='metric-label')
-        ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
-        
-        html.Div([
-            html.H2(f"{avg_profit_margin:.1%}", className='metric-value'),
-            html.P("Average Margin", className='metric-label')
-        ], className='metric-card', style={'width': '22%', 'display': 'inline-block'})
-    ], style={'textAlign': 'center', 'marginBottom': '30px'}),
-    
-    # Filters
-    html.Div([
-        html.Div([
-            html.Label("Region:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
-            dcc.Dropdown(
-                id='region-filter',
-                options=[{'label': 'All Regions', 'value': 'all'}] + 
-                        [{'label': region, 'value': region} for region in sales_data['Region'].unique()],
-                value='all',
-                style={'width': '100%'}
-            )
-        ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '5%'}),
-        
-        html.Div([
-            html.Label("Product Category:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
-            dcc.Dropdown(
-                id='category-filter',
-                options=[{'label': 'All Categories', 'value': 'all'}] + 
-                        [{'label': cat, 'value': cat} for cat in sales_data['Product_Category'].unique()],
-                value='all',
-                style={'width': '100%'}
-            )
-        ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '5%'}),
-        
-        html.Div([
-            html.Label("Date Range:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
-            dcc.DatePickerRange(
-                id='date-range',
-                start_date=sales_data['Date'].min(),
-                end_date=sales_data['Date'].max(),
-                display_format='YYYY-MM-DD',
-                style={'width': '100%'}
-            )
-        ], style={'width': '30%', 'display': 'inline-block'})
-    ], className='filter-container'),
-    
-    # Charts Row 1
-    html.Div([
-        html.Div([
-            dcc.Graph(id='sales-trend-chart')
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'}),
-        
-        html.Div([
-            dcc.Graph(id='regional-performance-chart')
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'})
-    ]),
-    
-    # Charts Row 2
-    html.Div([
-        html.Div([
-            dcc.Graph(id='category-analysis-chart')
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'}),
-        
-        html.Div([
-            dcc.Graph(id='customer-segment-chart')
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'})
-    ]),
-    
-    # Advanced Analytics Row
-    html.Div([
-        html.Div([
-            dcc.Graph(id='product-performance-bubble')
-        ], style={'width': '60%', 'display': 'inline-block', 'padding': '10px'}),
-        
-        html.Div([
-            dcc.Graph(id='satisfaction-by-segment')
-        ], style={'width': '40%', 'display': 'inline-block', 'padding': '10px'})
-    ]),
-    
-    # Data Tables
-    html.Div([
-        html.Div([
-            html.H3("Top Performing Products", style={'textAlign': 'center', 'color': '#2c3e50'}),
-            dash_table.DataTable(
-                id='top-products-table',
-                columns=[
-                    {'name': 'Product', 'id': 'Product'},
-                    {'name': 'Revenue', 'id': 'Revenue', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
-                    {'name': 'Units Sold', 'id': 'Units_Sold', 'type': 'numeric'},
-                    {'name': 'Profit Margin', 'id': 'Profit_Margin', 'type': 'numeric', 'format': {'specifier': '.1%'}},
-                    {'name': 'Rating', 'id': 'Customer_Rating', 'type': 'numeric', 'format': {'specifier': '.1f'}}
-                ],
-                data=product_data.nlargest(10, 'Revenue').to_dict('records'),
-                style_cell={'textAlign': 'center', 'padding': '10px'},
-                style_header={
-                    'backgroundColor': '#3498db',
-                    'color': 'white',
-                    'fontWeight': 'bold',
-                    'border': '1px solid white'
-                },
-                style_data={
-                    'backgroundColor': '#ecf0f1',
-                    'border': '1px solid white'
-                },
-                style_data_conditional=[
-                    {
-                        'if': {'row_index': 0},
-                        'backgroundColor': '#2ecc71',
-                        'color': 'white',
-                    }
-                ]
-            )
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px'}),
-        
-        html.Div([
-            html.H3("Regional Leaders", style={'textAlign': 'center', 'color': '#2c3e50'}),
-            dash_table.DataTable(
-                id='regional-table',
-                columns=[
-                    {'name': 'Region', 'id': 'Region'},
-                    {'name': 'Total Sales', 'id': 'Total_Sales', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
-                    {'name': 'Avg Transaction', 'id': 'Avg_Transaction', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
-                    {'name': 'Customers', 'id': 'Customer_Count', 'type': 'numeric'}
-                ],
-                style_cell={'textAlign': 'center', 'padding': '10px'},
-                style_header={
-                    'backgroundColor': '#e74c3c',
-                    'color': 'white',
-                    'fontWeight': 'bold',
-                    'border': '1px solid white'
-                },
-                style_data={
-                    'backgroundColor': '#ecf0f1',
-                    'border': '1px solid white'
-                }
-            )
-        ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px'})
-    ], style={'backgroundColor': 'white', 'margin': '20px 0', 'borderRadius': '15px', 'boxShadow': '0 2px 10px rgba(0,0,0,0.1)'}),
-    
-    # Insights Section
-    html.Div([
-        html.H3("📊 Key Business Insights & Recommendations", 
-                style={'color': '#2c3e50', 'marginBottom': '20px', 'fontSize': '1.8em'}),
-        
-        html.Div([
-            html.Div([
-                html.H4("💰 Revenue Optimization", style={'color': '#27ae60', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li("Focus marketing spend on top-performing product categories"),
-                    html.Li("Implement dynamic pricing for high-margin products"),
-                    html.Li("Expand inventory in peak sales periods identified in trends")
-                ])
-            ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top', 'paddingRight': '20px'}),
-            
-            html.Div([
-                html.H4("🎯 Customer Experience", style={'color': '#3498db', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li("Implement targeted retention programs for high-value segments"),
-                    html.Li("Address satisfaction gaps in underperforming regions"),
-                    html.Li("Develop personalized product recommendations")
-                ])
-            ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top'})
-        ]),
-        
-        html.Div([
-            html.Div([
-                html.H4("📈 Growth Opportunities", style={'color': '#e67e22', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li("Expand successful product lines to underperforming regions"),
-                    html.Li("Investigate seasonal patterns for inventory planning"),
-                    html.Li("Develop cross-selling strategies for premium customers")
-                ])
-            ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top', 'paddingRight': '20px'}),
-            
-            html.Div([
-                html.H4("⚡ Operational Efficiency", style={'color': '#9b59b6', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li("Optimize supply chain for top-selling products"),
-                    html.Li("Implement predictive analytics for demand forecasting"),
-                    html.Li("Automate reporting for real-time decision making")
-                ])
-            ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top'})
-        ])
-    ], className='insights-container')
-    
-], style={'margin': '0 20px', 'fontFamily': 'Segoe UI, sans-serif'})
+def trend_series(daily_sales):
+    """Bucket the daily roll-up to a week or month grain and cap its point count"""
+    days = daily_sales['Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    days, sales, grain = resample_trend(days, daily_sales['Sales'].to_numpy())
+    return pd.DataFrame({'Date': from_days(days), 'Sales': sales}), TREND_TITLES[grain]
 
-# Callbacks for interactivity
-@app.callback(
-    [Output('sales-trend-chart', 'figure'),
-     Output('regional-performance-chart', 'figure'),
-     Output('category-analysis-chart', 'figure'),
-     Output('customer-segment-chart', 'figure'),
-     Output('product-performance-bubble', 'figure'),
-     Output('satisfaction-by-segment', 'figure'),
-     Output('regional-table', 'data')],
-    [Input('region-filter', 'value'),
-     Input('category-filter', 'value'),
-     Input('date-range', 'start_date'),
-     Input('date-range', 'end_date')]
-)
-def update_dashboard(selected_region, selected_category, start_date, end_date):
-    # Filter data
-    filtered_sales = sales_data[
-        (sales_data['Date'] >= start_date) & 
-        (sales_data['Date'] <= end_date)
-    ]
-    
-    if selected_region != 'all':
-        filtered_sales = filtered_sales[filtered_sales['Region'] == selected_region]
-    
-    if selected_category != 'all':
-        filtered_sales = filtered_sales[filtered_sales['Product_Category'] == selected_category]
-    
-    # 1. Sales Trend Chart
-    daily_sales = filtered_sales.groupby('Date')['Sales'].sum().reset_index()
-    trend_fig = px.line(daily_sales, x='Date', y='Sales', 
-                       title='Sales Trend Over Time',
+def build_trend_figure(daily_sales):
+    # plotly.express is only needed for the initial figures, so it is imported on the loader thread
+    import plotly.express as px
+    trend_sales, title = trend_series(daily_sales)
+    trend_fig = px.line(trend_sales, x='Date', y='Sales', 
+                       title=title,
                        color_discrete_sequence=['#3498db'])
     trend_fig.update_layout(
         showlegend=False,
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 2. Regional Performance Chart
-    regional_sales = filtered_sales.groupby('Region')['Sales'].sum().reset_index()
+    return trend_fig
+
+def build_regional_figure(regional_sales):
+    import plotly.express as px
     regional_fig = px.bar(regional_sales, x='Region', y='Sales',
                          title='Sales Performance by Region',
                          color='Sales',
@@ -409,9 +213,10 @@ def update_dashboard(selected_region, selected_category, start_date, end_date):
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 3. Category Analysis Chart
-    category_sales = filtered_sales.groupby('Product_Category')['Sales'].sum().reset_index()
+    return regional_fig
+
+def build_category_figure(category_sales):
+    import plotly.express as px
     category_fig = px.pie(category_sales, values='Sales', names='Product_Category',
                          title='Sales Distribution by Category',
                          color_discrete_sequence=px.colors.qualitative.Set3)
@@ -419,9 +224,10 @@ def update_dashboard(selected_region, selected_category, start_date, end_date):
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 4. Customer Segment Chart
-    segment_sales = filtered_sales.groupby('Customer_Segment')['Sales'].sum().reset_index()
+    return category_fig
+
+def build_segment_figure(segment_sales):
+    import plotly.express as px
     segment_fig = px.bar(segment_sales, x='Customer_Segment', y='Sales',
                         title='Revenue by Customer Segment',
                         color='Customer_Segment',
@@ -431,8 +237,9 @@ def update_dashboard(selected_region, selected_category, start_date, end_date):
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 5. Product Performance Bubble Chart
+    return segment_fig
+
+def build_product_bubble_figure():
     bubble_fig = go.Figure()
     bubble_fig.add_trace(go.Scatter(
         x=product_data['Units_Sold'],
@@ -456,30 +263,850 @@ def update_dashboard(selected_region, selected_category, start_date, end_date):
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 6. Satisfaction by Segment
-    satisfaction_fig = px.box(customer_data, x='Customer_Segment', y='Satisfaction_Score',
-                             title='Customer Satisfaction by Segment',
-                             color='Customer_Segment',
-                             color_discrete_sequence=['#e74c3c', '#f39c12', '#2ecc71'])
+    return bubble_fig
+
+def build_satisfaction_figure():
+    if BOX_PLOT_MODE == 'points':
+        import plotly.express as px
+        # Ship every score and let the browser compute the box statistics
+        satisfaction_fig = px.box(customer_data, x='Customer_Segment', y='Satisfaction_Score',
+                                 title='Customer Satisfaction by Segment',
+                                 color='Customer_Segment',
+                                 color_discrete_sequence=['#e74c3c', '#f39c12', '#2ecc71'])
+    else:
+        # Precomputed quartiles, fences and a capped outlier sample per segment, so
+        # the payload stays the same size however many customers there are
+        satisfaction_fig = go.Figure()
+        segments = customer_data['Customer_Segment'].to_numpy()
+        scores = customer_data['Satisfaction_Score'].to_numpy()
+        colors = ['#e74c3c', '#f39c12', '#2ecc71']
+        for index, segment in enumerate(pd.unique(segments)):
+            stats = box_statistics(scores[segments == segment])
+            if stats is None:
+                continue
+            color = colors[index % len(colors)]
+            satisfaction_fig.add_trace(go.Box(
+                name=segment, x=[segment], marker_color=color,
+                q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                mean=[stats['mean']]
+            ))
+            if len(stats['outliers']):
+                satisfaction_fig.add_trace(go.Scatter(
+                    x=[segment] * len(stats['outliers']), y=stats['outliers'],
+                    mode='markers', marker=dict(color=color, size=5), name=segment,
+                    hovertemplate=(f"{segment} outlier: %{{y}}<br>"
+                                   f"({stats['outlier_count']:,} outliers in total)<extra></extra>")
+                ))
+        satisfaction_fig.update_layout(
+            title='Customer Satisfaction by Segment',
+            xaxis_title='Customer_Segment',
+            yaxis_title='Satisfaction_Score'
+        )
     satisfaction_fig.update_layout(
         showlegend=False,
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    # 7. Regional Table Data
-    regional_stats = filtered_sales.groupby('Region').agg({
-        'Sales': ['sum', 'mean', 'count']
-    }).round(0)
-    regional_stats.columns = ['Total_Sales', 'Avg_Transaction', 'Customer_Count']
-    regional_stats = regional_stats.reset_index()
+    return satisfaction_fig
+
+def build_regional_table(regional_sales):
+    regional_stats = pd.DataFrame({
+        'Region': regional_sales['Region'],
+        'Total_Sales': regional_sales['Sales'].round(0),
+        'Avg_Transaction': regional_sales['Mean'].round(0),
+        'Customer_Count': regional_sales['Count'].round(0)
+    })
     regional_stats = regional_stats.sort_values('Total_Sales', ascending=False)
+    return regional_stats.to_dict('records')
+
+# Partial updates for the filter-dependent charts: only the trace data changes,
+# the layout and trace structure stay as built in the initial figures.
+# Roll-ups estimated from the sample carry a 'Sales_Error' column (95% half-widths),
+# drawn as error bars; exact roll-ups clear them in approximate mode.
+def error_bars(errors):
+    """Trace error_y for estimated values, or hidden error bars for exact ones"""
+    if errors is None:
+        return {'visible': False}
+    return {'type': 'data', 'array': payload.encode_numbers(errors), 'visible': True}
+
+def patch_trend_figure(daily_sales):
+    patch = Patch()
+    if 'Sales_Error' in daily_sales:
+        # Estimates come bucketed by month already
+        trend_sales = daily_sales
+        title = f"{TREND_TITLES[approximate.ESTIMATE_GRAIN]} (estimated)"
+        patch['data'][0]['error_y'] = error_bars(daily_sales['Sales_Error'])
+    else:
+        trend_sales, title = trend_series(daily_sales)
+        if approximate.APPROXIMATE:
+            patch['data'][0]['error_y'] = error_bars(None)
+    patch['data'][0]['x'] = payload.encode_dates(trend_sales['Date'])
+    patch['data'][0]['y'] = payload.encode_numbers(trend_sales['Sales'])
+    patch['layout']['title']['text'] = title
+    return patch
+
+def patch_regional_figure(regional_sales):
+    patch = Patch()
+    patch['data'][0]['x'] = regional_sales['Region']
+    patch['data'][0]['y'] = payload.encode_numbers(regional_sales['Sales'])
+    patch['data'][0]['marker']['color'] = payload.encode_numbers(regional_sales['Sales'])
+    if 'Sales_Error' in regional_sales or approximate.APPROXIMATE:
+        patch['data'][0]['error_y'] = error_bars(regional_sales.get('Sales_Error'))
+    return patch
+
+def patch_category_figure(category_sales):
+    patch = Patch()
+    patch['data'][0]['labels'] = category_sales['Product_Category']
+    patch['data'][0]['values'] = payload.encode_numbers(category_sales['Sales'])
+    if 'Sales_Error' in category_sales:
+        # Pie slices cannot carry error bars, so the half-width goes in the slice text
+        share = category_sales['Sales_Error'] / category_sales['Sales'].sum()
+        patch['data'][0]['text'] = [f"±{value:.1%}" for value in share]
+        patch['data'][0]['texttemplate'] = '%{percent} %{text}'
+    elif approximate.APPROXIMATE:
+        patch['data'][0]['text'] = None
+        patch['data'][0]['texttemplate'] = None
+    return patch
+
+def patch_segment_figure(segment_sales):
+    # The segment chart has one trace per segment; segments missing from the
+    # selection keep their trace with no bar so trace colors stay stable
+    patch = Patch()
+    totals = dict(zip(segment_sales['Customer_Segment'], segment_sales['Sales']))
+    errors = (dict(zip(segment_sales['Customer_Segment'], segment_sales['Sales_Error']))
+              if 'Sales_Error' in segment_sales else None)
+    for index, segment in enumerate(segment_trace_order):
+        present = segment in totals
+        patch['data'][index]['x'] = [segment] if present else []
+        patch['data'][index]['y'] = payload.encode_numbers([totals[segment]] if present else [])
+        if errors is not None or approximate.APPROXIMATE:
+            patch['data'][index]['error_y'] = error_bars(
+                None if errors is None else [errors[segment]] if present else [])
+    return patch
+
+def build_client_dataset():
+    """The full sales cube in the compact layout filtered by assets/client_filter.js
+
+    Cells are sorted by day and indexed by day_starts; each cell key packs the
+    region, category and segment codes into one integer.
+    """
+    cube = sales_source.cube()
+    labels = {column: list(cube.dictionaries[column]) for column in CUBE_DIMENSIONS}
+    first_day = cube.first_day if len(cube) else 0
+    n_days = cube.last_day - first_day + 1 if len(cube) else 0
+    cell = np.zeros(len(cube), dtype=np.int64)
+    for column in CUBE_DIMENSIONS:
+        cell = cell * len(labels[column]) + cube.codes[column]
+    return {
+        'version': sales_source.version(),
+        'first_day': first_day,
+        'day_starts': np.searchsorted(cube.day, np.arange(first_day, first_day + n_days + 1)),
+        'cell': cell,
+        # Rounded to cents: each cell is off by at most half a cent, and the payload shrinks by a third
+        'sales': np.round(cube.sales, 2),
+        'count': cube.count,
+        'labels': labels,
+        'segment_traces': segment_trace_order,
+        'trend': {'grain': TREND_GRAIN, 'target_points': TREND_TARGET_POINTS,
+                  'max_points': TREND_MAX_POINTS, 'titles': TREND_TITLES},
+    }
+
+_client_dataset = {}
+
+def client_dataset():
+    """build_client_dataset() for the current data version, built once per version"""
+    version = sales_source.version()
+    if version not in _client_dataset:
+        _client_dataset.clear()
+        _client_dataset[version] = build_client_dataset()
+    return _client_dataset[version]
+
+# Startup: the data loads on a background thread, so the server binds its port and answers
+# /health and a loading page at once; the full layout is served once initialize() is done
+startup_times = []
+loading = {'status': 'starting', 'error': None, 'pid': None}
+_loading_lock = threading.Lock()
+_loading_done = threading.Event()
+
+@contextmanager
+def startup_stage(name):
+    """Time one step of startup for the breakdown logged when loading finishes"""
+    started = time.perf_counter()
+    yield
+    startup_times.append((name, time.perf_counter() - started))
+
+def initialize():
+    """Load the data and build everything the layout and callbacks read"""
+    global sales_source, query_backend, customer_data, product_data, CLIENT_FILTERING
+    global APPROXIMATE_QUERIES, estimate_sample, leaderboards
+    global trend_fig, regional_fig, category_fig, segment_fig, segment_trace_order
+    global bubble_fig, satisfaction_fig, initial_regional_table, top_products
+    global total_customers, avg_satisfaction, avg_profit_margin
+    
+    # Every filter-dependent chart is a roll-up of the pre-aggregated
+    # (Date, Region, Product_Category, Customer_Segment) cube rather than a scan of raw rows
+    with startup_stage('data'):
+        sales_source, customer_data, product_data = load_data()
+    print(f"Sales data: {sales_source.summary['transactions']:,} transactions")
+    if peak_rss_mb() is not None:
+        print(f"Peak memory after loading data: {peak_rss_mb():,.0f} MB (sales load budget {MEMORY_BUDGET_MB:,} MB)")
+    with startup_stage('result cache'):
+        result_cache.set_version(f"{sales_source.version()}-{RESULTS_FORMAT}")
+    with startup_stage('query backend'):
+        query_backend = open_query_backend(sales_source)
+    with startup_stage('leaderboards'):
+        leaderboards = build_leaderboards(sales_source)
+    
+    # Key metrics that do not follow the live sales data
+    total_customers = len(customer_data)
+    avg_satisfaction = customer_data['Satisfaction_Score'].mean()
+    avg_profit_margin = product_data['Profit_Margin'].mean()
+    top_products = product_data.nlargest(10, 'Revenue').to_dict('records')
     
-    return (trend_fig, regional_fig, category_fig, segment_fig, 
-            bubble_fig, satisfaction_fig, regional_stats.to_dict('records'))
+    # Build every figure once: the product bubble and satisfaction charts ignore the
+    # filters, the others start from the full range and are patched by the callback
+    with startup_stage('figures'):
+        initial_rollups = sales_source.cube().aggregate(CUBE_DIMENSIONS)
+        (trend_fig, regional_fig, category_fig, segment_fig, initial_regional_table,
+         bubble_fig, satisfaction_fig) = task_pool.run_all([
+            partial(build_trend_figure, initial_rollups['Date']),
+            partial(build_regional_figure, initial_rollups['Region']),
+            partial(build_category_figure, initial_rollups['Product_Category']),
+            partial(build_segment_figure, initial_rollups['Customer_Segment']),
+            partial(build_regional_table, initial_rollups['Region']),
+            build_product_bubble_figure,
+            build_satisfaction_figure,
+        ])
+        segment_trace_order = [trace.name for trace in segment_fig.data]
+    
+    CLIENT_FILTERING = FILTER_MODE == 'client'
+    if CLIENT_FILTERING and len(sales_source.cube()) > CLIENT_MAX_CELLS:
+        print(f"Sales cube has more than {CLIENT_MAX_CELLS:,} cells; filtering on the server instead")
+        CLIENT_FILTERING = False
+    if CLIENT_FILTERING:
+        with startup_stage('client dataset'):
+            client_dataset()
+    APPROXIMATE_QUERIES = approximate.APPROXIMATE and not CLIENT_FILTERING
+    if APPROXIMATE_QUERIES:
+        # Sampling reads every raw row, so it runs in the background; filter changes
+        # are answered exactly until it is ready
+        estimate_sample = approximate.BackgroundSample(sales_source)
+        estimate_sample.current()
+    register_filter_callbacks()
+
+def _load_in_background():
+    try:
+        initialize()
+    except Exception as e:
+        traceback.print_exc()
+        loading.update(status='failed', error=f"{type(e).__name__}: {e}")
+    else:
+        loading['status'] = 'ready'
+        stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in startup_times)
+        print(f"Startup: {stages}; ready {time.perf_counter() - startup_started:.2f}s after start")
+    _loading_done.set()
+
+def start_loading():
+    """Start initialize() on a background thread, once per process"""
+    with _loading_lock:
+        # A worker forked from a process that finished loading already has the data;
+        # one forked mid-load has lost the loader thread and loads for itself
+        if loading['status'] in ('ready', 'failed') or loading['pid'] == os.getpid():
+            return
+        loading.update(status='loading', pid=os.getpid())
+        print("Loading data in the background...")
+        _loading_done.clear()
+        threading.Thread(target=_load_in_background, name='dashboard-loader', daemon=True).start()
+
+def wait_until_ready(timeout=None):
+    """Block until the data has loaded (starting the load if needed)"""
+    start_loading()
+    if not _loading_done.wait(timeout):
+        raise TimeoutError(f"Dashboard data not loaded after {timeout}s")
+    if loading['status'] != 'ready':
+        raise RuntimeError(f"Dashboard data failed to load: {loading['error']}")
+
+def create_server():
+    """WSGI app factory for forking servers: returns the server once the data has loaded
+
+    With gunicorn --preload 'dashboard_advanced:create_server()' the master
+    loads the data before forking, so every worker starts ready and shares it.
+    """
+    wait_until_ready()
+    return server
+
+@server.route('/health')
+def health():
+    """Startup status: 'loading' until the data is in, then 'ready'"""
+    status = 500 if loading['status'] == 'failed' else 200
+    return {'status': loading['status'], 'error': loading['error'],
+            'uptime_seconds': round(time.perf_counter() - startup_started, 3)}, status
+
+@server.route('/export/sales.<fmt>')
+def export_sales(fmt):
+    """Stream the raw sales rows of a selection (?region=&category=&start_date=&end_date=) as CSV or Parquet"""
+    if fmt not in export.EXPORT_FORMATS:
+        return {'error': f"Unknown export format {fmt!r}; expected csv or parquet"}, 404
+    if loading['status'] != 'ready':
+        return {'status': loading['status'], 'error': loading['error']}, 503
+    if fmt == 'parquet' and export.pq is None:
+        return {'error': "Parquet export needs pyarrow (pip install pyarrow)"}, 501
+    try:
+        start_day, end_day = to_day(request.args.get('start_date')), to_day(request.args.get('end_date'))
+    except ValueError:
+        return {'error': "start_date and end_date must be dates (YYYY-MM-DD)"}, 400
+    equals = filter_equals(request.args.get('region', 'all'), request.args.get('category', 'all'))
+    chunks = export.export_chunks(sales_source, start_day, end_day, equals)
+    stream = export.csv_stream(chunks) if fmt == 'csv' else export.parquet_stream(chunks)
+    return Response(stream_with_context(stream), mimetype=export.EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="sales.{fmt}"'})
+
+def loading_layout():
+    """Placeholder page served while the data loads; it reloads itself once /health says ready"""
+    if loading['status'] == 'failed':
+        message = f"The dashboard data failed to load: {loading['error']}"
+    else:
+        message = "Loading data, the dashboard will appear in a moment..."
+    return html.Div([
+        html.H1("Business Intelligence Dashboard", 
+                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '10px', 'fontSize': '3em'}),
+        html.P(message, style={'textAlign': 'center', 'color': '#7f8c8d', 'fontSize': '1.2em'}),
+        dcc.Interval(id='startup-poll', interval=1000)
+    ], style={'margin': '0 20px', 'fontFamily': 'Segoe UI, sans-serif'})
+
+app.clientside_callback(
+    """
+    function(n_intervals) {
+        fetch('/health').then(function (response) { return response.json(); })
+            .then(function (health) { if (health.status === 'ready') { window.location.reload(); } });
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('startup-poll', 'disabled'),
+    Input('startup-poll', 'n_intervals'),
+    prevent_initial_call=True
+)
+
+# Define the layout, built per page load from the current sales summary
+def leaderboard_table(table_id, column, title, color):
+    """Leaderboard table of one column, starting from the unfiltered ranking"""
+    return dash_table.DataTable(
+        id=table_id,
+        data=leaderboards[column].top(),
+        columns=[
+            {'name': 'Rank', 'id': 'Rank', 'type': 'numeric'},
+            {'name': title, 'id': column},
+            {'name': 'Total Sales', 'id': 'Total_Sales', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
+            {'name': 'Transactions', 'id': 'Transactions', 'type': 'numeric', 'format': {'specifier': ',.0f'}},
+            {'name': 'Avg Transaction', 'id': 'Avg_Transaction', 'type': 'numeric', 'format': {'specifier': '$,.0f'}}
+        ],
+        style_cell={'textAlign': 'center', 'padding': '10px'},
+        style_header={
+            'backgroundColor': color,
+            'color': 'white',
+            'fontWeight': 'bold',
+            'border': '1px solid white'
+        },
+        style_data={
+            'backgroundColor': '#ecf0f1',
+            'border': '1px solid white'
+        }
+    )
+
+def serve_layout():
+    start_loading()
+    if loading['status'] != 'ready':
+        return loading_layout()
+    summary = sales_source.summary
+    return html.Div([
+        # Header
+        html.Div([
+            html.H1("Business Intelligence Dashboard", 
+                    style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '10px', 'fontSize': '3em'}),
+            html.P("Real-time Analytics & Insights", 
+                   style={'textAlign': 'center', 'color': '#7f8c8d', 'fontSize': '1.2em', 'marginBottom': '30px'})
+        ]),
+    
+        # Live updates: the interval polls for appended sales rows and the store holds
+        # the data version (and last day) this browser is showing
+        dcc.Interval(id='live-refresh', interval=max(LIVE_REFRESH_SECONDS, 1) * 1000,
+                     disabled=LIVE_REFRESH_SECONDS <= 0),
+        dcc.Store(id='data-version', data={'version': sales_source.version(),
+                                           'last_day': summary['last_day']}),
+        # The sales cube the browser filters in client filtering mode
+        dcc.Store(id='client-dataset', data=client_dataset() if CLIENT_FILTERING else None),
+    
+        # Key Metrics Row
+        html.Div([
+            html.Div([
+                html.H2(f"${summary['total_sales']:,.0f}", id='total-revenue', className='metric-value'),
+                html.P("Total Revenue", className='metric-label')
+            ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
+        
+            html.Div([
+                html.H2(f"{total_customers:,}", className='metric-value'),
+                html.P("Active Customers", className='metric-label')
+            ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
+        
+            html.Div([
+                html.H2(f"{avg_satisfaction:.1f}/10", className='metric-value'),
+                html.P("Customer Satisfaction", className='metric-label')
+            ], className='metric-card', style={'width': '22%', 'display': 'inline-block'}),
+        
+            html.Div([
+                html.H2(f"{avg_profit_margin:.1%}", className='metric-value'),
+                html.P("Average Margin", className='metric-label')
+            ], className='metric-card', style={'width': '22%', 'display': 'inline-block'})
+        ], style={'textAlign': 'center', 'marginBottom': '30px'}),
+    
+        # Filters
+        html.Div([
+            html.Div([
+                html.Label("Region:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
+                dcc.Dropdown(
+                    id='region-filter',
+                    options=[{'label': 'All Regions', 'value': 'all'}] + 
+                            [{'label': region, 'value': region} for region in summary['labels']['Region']],
+                    value='all',
+                    style={'width': '100%'}
+                )
+            ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '5%'}),
+        
+            html.Div([
+                html.Label("Product Category:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
+                dcc.Dropdown(
+                    id='category-filter',
+                    options=[{'label': 'All Categories', 'value': 'all'}] + 
+                            [{'label': cat, 'value': cat} for cat in summary['labels']['Product_Category']],
+                    value='all',
+                    style={'width': '100%'}
+                )
+            ], style={'width': '30%', 'display': 'inline-block', 'marginRight': '5%'}),
+        
+            html.Div([
+                html.Label("Date Range:", style={'fontWeight': 'bold', 'marginBottom': '5px', 'display': 'block'}),
+                dcc.DatePickerRange(
+                    id='date-range',
+                    start_date=from_days([summary['first_day']])[0],
+                    end_date=from_days([summary['last_day']])[0],
+                    display_format='YYYY-MM-DD',
+                    style={'width': '100%'}
+                )
+            ], style={'width': '30%', 'display': 'inline-block'})
+        ], className='filter-container'),
+    
+        # Approximate mode: the pending exact computation and the note shown while
+        # the charts hold estimates; the page id lets a new selection cancel the last one's
+        dcc.Store(id='refinement'),
+        dcc.Store(id='page-id', data=uuid.uuid4().hex),
+        html.Div(id='estimate-status', className='estimate-status'),
+    
+        # Downloads of the rows behind the charts, following the filters
+        html.Div([
+            html.A("Download these rows (CSV)", id='export-csv', href='/export/sales.csv'),
+            html.Span([" · ", html.A("Parquet", id='export-parquet', href='/export/sales.parquet')],
+                      style={} if export.pq is not None else {'display': 'none'}),
+        ], className='export-links'),
+    
+        # Charts Row 1
+        html.Div([
+            html.Div([
+                dcc.Graph(id='sales-trend-chart', figure=trend_fig)
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'}),
+        
+            html.Div([
+                dcc.Graph(id='regional-performance-chart', figure=regional_fig)
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'})
+        ]),
+    
+        # Charts Row 2
+        html.Div([
+            html.Div([
+                dcc.Graph(id='category-analysis-chart', figure=category_fig)
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'}),
+        
+            html.Div([
+                dcc.Graph(id='customer-segment-chart', figure=segment_fig)
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '10px'})
+        ]),
+    
+        # Advanced Analytics Row
+        html.Div([
+            html.Div([
+                dcc.Graph(id='product-performance-bubble', figure=bubble_fig)
+            ], style={'width': '60%', 'display': 'inline-block', 'padding': '10px'}),
+        
+            html.Div([
+                dcc.Graph(id='satisfaction-by-segment', figure=satisfaction_fig)
+            ], style={'width': '40%', 'display': 'inline-block', 'padding': '10px'})
+        ]),
+    
+        # Data Tables
+        html.Div([
+            html.Div([
+                html.H3("Top Performing Products", style={'textAlign': 'center', 'color': '#2c3e50'}),
+                dash_table.DataTable(
+                    id='top-products-table',
+                    columns=[
+                        {'name': 'Product', 'id': 'Product'},
+                        {'name': 'Revenue', 'id': 'Revenue', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
+                        {'name': 'Units Sold', 'id': 'Units_Sold', 'type': 'numeric'},
+                        {'name': 'Profit Margin', 'id': 'Profit_Margin', 'type': 'numeric', 'format': {'specifier': '.1%'}},
+                        {'name': 'Rating', 'id': 'Customer_Rating', 'type': 'numeric', 'format': {'specifier': '.1f'}}
+                    ],
+                    data=top_products,
+                    style_cell={'textAlign': 'center', 'padding': '10px'},
+                    style_header={
+                        'backgroundColor': '#3498db',
+                        'color': 'white',
+                        'fontWeight': 'bold',
+                        'border': '1px solid white'
+                    },
+                    style_data={
+                        'backgroundColor': '#ecf0f1',
+                        'border': '1px solid white'
+                    },
+                    style_data_conditional=[
+                        {
+                            'if': {'row_index': 0},
+                            'backgroundColor': '#2ecc71',
+                            'color': 'white',
+                        }
+                    ]
+                )
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px'}),
+        
+            html.Div([
+                html.H3("Regional Leaders", style={'textAlign': 'center', 'color': '#2c3e50'}),
+                dash_table.DataTable(
+                    id='regional-table',
+                    data=initial_regional_table,
+                    columns=[
+                        {'name': 'Region', 'id': 'Region'},
+                        {'name': 'Total Sales', 'id': 'Total_Sales', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
+                        {'name': 'Avg Transaction', 'id': 'Avg_Transaction', 'type': 'numeric', 'format': {'specifier': '$,.0f'}},
+                        {'name': 'Customers', 'id': 'Customer_Count', 'type': 'numeric'}
+                    ],
+                    style_cell={'textAlign': 'center', 'padding': '10px'},
+                    style_header={
+                        'backgroundColor': '#e74c3c',
+                        'color': 'white',
+                        'fontWeight': 'bold',
+                        'border': '1px solid white'
+                    },
+                    style_data={
+                        'backgroundColor': '#ecf0f1',
+                        'border': '1px solid white'
+                    }
+                )
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px'})
+        ], style={'backgroundColor': 'white', 'margin': '20px 0', 'borderRadius': '15px', 'boxShadow': '0 2px 10px rgba(0,0,0,0.1)'}),
+    
+        # Leaderboards, following the filters
+        html.Div([
+            html.Div([
+                html.H3(f"Top {LEADERBOARD_SIZE} Sales Reps", style={'textAlign': 'center', 'color': '#2c3e50'}),
+                leaderboard_table('rep-leaderboard', 'Sales_Rep', 'Sales Rep', '#9b59b6')
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px', 'verticalAlign': 'top'}),
+        
+            html.Div([
+                html.H3("Sales by Channel", style={'textAlign': 'center', 'color': '#2c3e50'}),
+                leaderboard_table('channel-leaderboard', 'Channel', 'Channel', '#16a085')
+            ], style={'width': '50%', 'display': 'inline-block', 'padding': '20px', 'verticalAlign': 'top'})
+        ], style={'backgroundColor': 'white', 'margin': '20px 0', 'borderRadius': '15px', 'boxShadow': '0 2px 10px rgba(0,0,0,0.1)'}),
+    
+        # Insights Section
+        html.Div([
+            html.H3("📊 Key Business Insights & Recommendations", 
+                    style={'color': '#2c3e50', 'marginBottom': '20px', 'fontSize': '1.8em'}),
+        
+            html.Div([
+                html.Div([
+                    html.H4("💰 Revenue Optimization", style={'color': '#27ae60', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li("Focus marketing spend on top-performing product categories"),
+                        html.Li("Implement dynamic pricing for high-margin products"),
+                        html.Li("Expand inventory in peak sales periods identified in trends")
+                    ])
+                ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top', 'paddingRight': '20px'}),
+            
+                html.Div([
+                    html.H4("🎯 Customer Experience", style={'color': '#3498db', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li("Implement targeted retention programs for high-value segments"),
+                        html.Li("Address satisfaction gaps in underperforming regions"),
+                        html.Li("Develop personalized product recommendations")
+                    ])
+                ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top'})
+            ]),
+        
+            html.Div([
+                html.Div([
+                    html.H4("📈 Growth Opportunities", style={'color': '#e67e22', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li("Expand successful product lines to underperforming regions"),
+                        html.Li("Investigate seasonal patterns for inventory planning"),
+                        html.Li("Develop cross-selling strategies for premium customers")
+                    ])
+                ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top', 'paddingRight': '20px'}),
+            
+                html.Div([
+                    html.H4("⚡ Operational Efficiency", style={'color': '#9b59b6', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li("Optimize supply chain for top-selling products"),
+                        html.Li("Implement predictive analytics for demand forecasting"),
+                        html.Li("Automate reporting for real-time decision making")
+                    ])
+                ], style={'width': '50%', 'display': 'inline-block', 'verticalAlign': 'top'})
+            ])
+        ], className='insights-container')
+    
+    ], style={'margin': '0 20px', 'fontFamily': 'Segoe UI, sans-serif'})
+
+app.layout = serve_layout
+
+# Callbacks for interactivity
+DASHBOARD_OUTPUTS = [Output('sales-trend-chart', 'figure'),
+                     Output('regional-performance-chart', 'figure'),
+                     Output('category-analysis-chart', 'figure'),
+                     Output('customer-segment-chart', 'figure'),
+                     Output('regional-table', 'data')]
+FILTER_INPUTS = [Input('region-filter', 'value'),
+                 Input('category-filter', 'value'),
+                 Input('date-range', 'start_date'),
+                 Input('date-range', 'end_date')]
+
+# Export links carry the current selection; built in the browser, no round trip
+app.clientside_callback(
+    """
+    function(region, category, startDate, endDate) {
+        var query = new URLSearchParams({
+            region: region || 'all', category: category || 'all',
+            start_date: (startDate || '').slice(0, 10), end_date: (endDate || '').slice(0, 10)
+        }).toString();
+        return ['/export/sales.csv?' + query, '/export/sales.parquet?' + query];
+    }
+    """,
+    [Output('export-csv', 'href'), Output('export-parquet', 'href')],
+    FILTER_INPUTS
+)
+
+@metrics.timed_callback
+def update_dashboard(selected_region, selected_category, start_date, end_date, data_version):
+    if data_version and data_version['version'] != sales_source.version():
+        # The browser saw newer data through another worker process; catch up first
+        refresh_sales()
+    filters = normalize_filters(selected_region, selected_category, start_date, end_date)
+    key = json.dumps(filters)
+    # The version of the data the outputs are computed from: a refresh meanwhile must not
+    # file them under the new one
+    version = result_cache.version
+    with metrics.span('cache'):
+        cached = result_cache.get(key, version)
+    if cached is not None:
+        return payload.loads(cached)
+    
+    outputs, encoded = build_dashboard_outputs(*filters)
+    result_cache.set(key, encoded, version)
+    return outputs
+
+# Exact computations that outlived the approximate mode's latency budget
+refiner = approximate.Refiner()
+
+@metrics.timed_callback
+def update_dashboard_progressive(selected_region, selected_category, start_date, end_date, data_version, page_id):
+    """The exact outputs if they are ready within the latency budget, otherwise estimates
+
+    Estimates come with a refinement request, which refine_dashboard answers
+    with the exact outputs once the computation started here finishes.
+    """
+    args = (selected_region, selected_category, start_date, end_date, data_version)
+    sample = estimate_sample.current()
+    if sample is None:
+        return list(update_dashboard(*args)) + [None, '']
+    filters = normalize_filters(selected_region, selected_category, start_date, end_date)
+    key = json.dumps(filters)
+    exact = refiner.submit(key, update_dashboard, *args, page=page_id)
+    try:
+        return list(exact.result(timeout=approximate.APPROXIMATE_BUDGET_MS / 1000)) + [None, '']
+    except FutureTimeout:
+        pass
+    except CancelledError:
+        # The page has moved on to a newer selection
+        raise PreventUpdate
+    
+    with metrics.span('estimate'):
+        rollups = sample.estimate(filters[2], filters[3], filter_equals(selected_region, selected_category))
+    with metrics.span('figures'):
+        outputs = [patch_trend_figure(rollups['Date']),
+                   patch_regional_figure(rollups['Region']),
+                   patch_category_figure(rollups['Product_Category']),
+                   patch_segment_figure(rollups['Customer_Segment']),
+                   build_regional_table(rollups['Region'])]
+    status = (f"Estimated from a {len(sample):,}-transaction sample, with 95% confidence "
+              f"intervals; computing the exact figures…")
+    return outputs + [{'key': key, 'filters': list(args[:4])}, status]
+
+@metrics.timed_callback
+def refine_dashboard(refinement, selected_region, selected_category, start_date, end_date, data_version):
+    """Replace estimated outputs with the exact ones for the same selection"""
+    # A refinement for a selection the browser has since moved away from is dropped
+    if refinement is None or refinement['filters'] != [selected_region, selected_category, start_date, end_date]:
+        raise PreventUpdate
+    args = (selected_region, selected_category, start_date, end_date, data_version)
+    try:
+        return list(refiner.result(refinement['key'], update_dashboard, *args)) + ['']
+    except CancelledError:
+        raise PreventUpdate
+
+@metrics.timed_callback
+def update_client_dataset(data_version):
+    """Ship the cube again when the browser is told about new data"""
+    if data_version['version'] != sales_source.version():
+        refresh_sales()
+    return client_dataset()
+
+def register_filter_callbacks():
+    """Register the filter callbacks for the mode chosen once the data has loaded"""
+    if CLIENT_FILTERING:
+        # Filter changes are handled in the browser; the server only sends a new cube
+        # when live updates change the data
+        app.clientside_callback(
+            ClientsideFunction(namespace='dashboard', function_name='filterCharts'),
+            DASHBOARD_OUTPUTS,
+            FILTER_INPUTS + [Input('client-dataset', 'data')],
+            [State('sales-trend-chart', 'figure'),
+             State('regional-performance-chart', 'figure'),
+             State('category-analysis-chart', 'figure'),
+             State('customer-segment-chart', 'figure')]
+        )
+        app.callback(Output('client-dataset', 'data'), Input('data-version', 'data'),
+                     prevent_initial_call=True)(update_client_dataset)
+    elif APPROXIMATE_QUERIES:
+        # Estimates first when the exact answer is slow, then the exact answer
+        app.callback(DASHBOARD_OUTPUTS + [Output('refinement', 'data'), Output('estimate-status', 'children')],
+                     FILTER_INPUTS + [Input('data-version', 'data')],
+                     [State('page-id', 'data')])(update_dashboard_progressive)
+        app.callback([Output(output.component_id, output.component_property, allow_duplicate=True)
+                      for output in DASHBOARD_OUTPUTS + [Output('estimate-status', 'children')]],
+                     Input('refinement', 'data'),
+                     [State(filter_input.component_id, filter_input.component_property)
+                      for filter_input in FILTER_INPUTS] + [State('data-version', 'data')],
+                     prevent_initial_call=True)(refine_dashboard)
+    else:
+        app.callback(DASHBOARD_OUTPUTS, FILTER_INPUTS + [Input('data-version', 'data')])(update_dashboard)
+
+def refresh_sales():
+    """Fold rows appended to the sales files into this process's aggregates"""
+    new_rows = sales_source.refresh()
+    if new_rows:
+        print(f"Ingested {new_rows:,} new sales rows")
+        query_backend.sync()
+        result_cache.set_version(f"{sales_source.version()}-{RESULTS_FORMAT}")
+    return new_rows
+
+def normalize_filters(selected_region, selected_category, start_date, end_date):
+    """Canonical (region, category, start_day, end_day) so equivalent selections share a cache entry"""
+    start_day, end_day = to_day(start_date), to_day(end_date)
+    summary = sales_source.summary
+    first_day, last_day = summary['first_day'], summary['last_day']
+    if first_day is not None:
+        # Bounds outside the data select the same rows as the data's own bounds
+        start_day = first_day if start_day is None else max(start_day, first_day)
+        end_day = last_day if end_day is None else min(end_day, last_day)
+    return [selected_region, selected_category, start_day, end_day]
+
+def filter_equals(selected_region, selected_category):
+    """The column == label predicates of the region and category dropdowns"""
+    equals = {}
+    if selected_region != 'all':
+        equals['Region'] = selected_region
+    if selected_category != 'all':
+        equals['Product_Category'] = selected_category
+    return equals
+
+def build_dashboard_outputs(selected_region, selected_category, start_day, end_day):
+    """The filter callback's outputs and their JSON text"""
+    # All roll-ups (daily, region, category, segment) of the selected cube cells,
+    # from the in-memory cube or pushed down to the SQL query backend
+    equals = filter_equals(selected_region, selected_category)
+    rollups = query_backend.rollups(start_day, end_day, equals)
+    
+    # Each output is built and serialized independently, concurrently for large selections
+    with metrics.span('figures'):
+        built = task_pool.run_all([
+            partial(build_and_encode, patch_trend_figure, rollups['Date']),
+            partial(build_and_encode, patch_regional_figure, rollups['Region']),
+            partial(build_and_encode, patch_category_figure, rollups['Product_Category']),
+            partial(build_and_encode, patch_segment_figure, rollups['Customer_Segment']),
+            partial(build_and_encode, build_regional_table, rollups['Region']),
+        ], size=sum(len(frame) for frame in rollups.values()))
+    outputs = [output for output, _ in built]
+    return outputs, '[' + ', '.join(encoded for _, encoded in built) + ']'
+
+def build_and_encode(build, rollup):
+    """One callback output and its JSON text for the result cache"""
+    output = build(rollup)
+    with metrics.span('serialize'):
+        return output, to_json_plotly(output)
+
+@app.callback(
+    [Output('rep-leaderboard', 'data'),
+     Output('channel-leaderboard', 'data')],
+    FILTER_INPUTS + [Input('data-version', 'data')]
+)
+@metrics.timed_callback
+def update_leaderboards(selected_region, selected_category, start_date, end_date, data_version):
+    """Rank reps and channels by sales within the selection"""
+    if data_version and data_version['version'] != sales_source.version():
+        refresh_sales()
+    _, _, start_day, end_day = normalize_filters(selected_region, selected_category, start_date, end_date)
+    equals = filter_equals(selected_region, selected_category)
+    with metrics.span('leaderboards'):
+        return [leaderboards[column].top(start_day, end_day, equals) for column in LEADERBOARD_COLUMNS]
+
+@app.callback(
+    [Output('data-version', 'data'),
+     Output('total-revenue', 'children'),
+     Output('date-range', 'end_date')],
+    Input('live-refresh', 'n_intervals'),
+    [State('data-version', 'data'),
+     State('date-range', 'end_date')],
+    prevent_initial_call=True
+)
+@metrics.timed_callback
+def ingest_new_sales(n_intervals, shown, end_date):
+    """Fold newly appended sales rows into the aggregates and push the new version to this browser"""
+    refresh_sales()
+    
+    # Another browser's tick may already have ingested the rows, so compare versions
+    # rather than relying on this tick's row count
+    version = sales_source.version()
+    if version == shown['version']:
+        raise PreventUpdate
+    summary = sales_source.summary
+    
+    # A range that ended at the last day shown keeps following the newest data
+    if shown['last_day'] is not None and to_day(end_date) is not None and to_day(end_date) >= shown['last_day']:
+        end_date = str(np.datetime_as_string(from_days([summary['last_day']])[0], unit='D'))
+    else:
+        end_date = no_update
+    return ({'version': version, 'last_day': summary['last_day']},
+            f"${summary['total_sales']:,.0f}", end_date)
+
+startup_times.append(('imports', time.perf_counter() - startup_started))
 
 if __name__ == '__main__':
+    # Development server; see run_dashboard.py --mode production for multi-worker serving
+    host = os.environ.get('DASHBOARD_HOST', '127.0.0.1')
+    port = int(os.environ.get('DASHBOARD_PORT', 8050))
     print("Starting Business Intelligence Dashboard...")
-    print("Dashboard will be available at: http://localhost:8050")
-    app.run_server(debug=True, port=8050)
+    print(f"Dashboard will be available at: http://localhost:{port}")
+    # The reloader's watcher process only restarts the server; the data loads in the
+    # child process that serves requests, which has WERKZEUG_RUN_MAIN set
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_loading()
+    app.run_server(debug=True, host=host, port=port)
+else:
+    start_loading()
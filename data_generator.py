@@ -1,80 +1,115 @@
+import argparse
+import glob
+import os
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-def generate_business_data():
-    """Generate realistic business data for dashboard demonstration"""
-    
-    np.random.seed(42)
-    
-    # Generate dates for 2 years
-    start_date = datetime(2023, 1, 1)
-    end_date = datetime(2024, 12, 31)
-    dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    
-    # Sales Data with seasonal patterns
+REGIONS = np.array(['North', 'South', 'East', 'West'], dtype=object)
+REGION_P = [0.3, 0.25, 0.25, 0.2]
+CATEGORIES = np.array(['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Books'], dtype=object)
+CATEGORY_P = [0.3, 0.25, 0.2, 0.15, 0.1]
+SEGMENTS = np.array(['Premium', 'Standard', 'Budget'], dtype=object)
+SEGMENT_P = [0.25, 0.5, 0.25]
+SALES_REPS = np.array([f"Rep_{i:02d}" for i in range(1, 21)], dtype=object)
+CHANNELS = np.array(['Online', 'Retail', 'Partner'], dtype=object)
+CHANNEL_P = [0.5, 0.35, 0.15]
+
+# Per-segment (purchase offset, purchase scale, base satisfaction)
+SEGMENT_PROFILES = np.array([[5, 8, 7.5], [2, 4, 6.5], [1, 2, 5.5]])
+
+DEFAULT_START = datetime(2023, 1, 1)
+DEFAULT_END = datetime(2024, 12, 31)
+DEFAULT_SALES_ROWS = 6949
+DEFAULT_CUSTOMERS = 2500
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def parse_count(value):
+    """Parse a row count such as 6949, 100k, 10M or 1.5e6"""
+    value = str(value).strip().lower().replace('_', '')
+    multiplier = {'k': 10**3, 'm': 10**6, 'b': 10**9}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def parse_date(value):
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def daily_sales_curve(dates, rng):
+    """Seasonal pattern plus a growing trend plus noise, one value per date"""
     base_sales = 10000
     seasonal_factor = np.sin(np.arange(len(dates)) * 2 * np.pi / 365) * 3000
     trend_factor = np.linspace(0, 2000, len(dates))  # Growing trend
-    noise = np.random.normal(0, 1500, len(dates))
-    
-    sales_data = []
-    for i, date in enumerate(dates):
-        daily_sales = base_sales + seasonal_factor[i] + trend_factor[i] + noise[i]
-        daily_sales = max(daily_sales, 1000)  # Minimum sales threshold
-        
-        # Add multiple records per day for different regions/products
-        for _ in range(np.random.randint(5, 15)):
-            sales_data.append({
-                'Date': date,
-                'Sales': daily_sales / np.random.randint(5, 15),
-                'Region': np.random.choice(['North', 'South', 'East', 'West'], p=[0.3, 0.25, 0.25, 0.2]),
-                'Product_Category': np.random.choice(['Electronics', 'Clothing', 'Home & Garden', 'Sports', 'Books'], 
-                                                   p=[0.3, 0.25, 0.2, 0.15, 0.1]),
-                'Customer_Segment': np.random.choice(['Premium', 'Standard', 'Budget'], p=[0.25, 0.5, 0.25]),
-                'Sales_Rep': f"Rep_{np.random.randint(1, 21):02d}",
-                'Channel': np.random.choice(['Online', 'Retail', 'Partner'], p=[0.5, 0.35, 0.15])
-            })
-    
-    sales_df = pd.DataFrame(sales_data)
-    
-    # Customer Data
-    num_customers = 2500
-    customer_data = []
-    
-    for i in range(1, num_customers + 1):
-        age = max(18, int(np.random.normal(40, 15)))
-        region = np.random.choice(['North', 'South', 'East', 'West'])
-        segment = np.random.choice(['Premium', 'Standard', 'Budget'], p=[0.25, 0.5, 0.25])
-        
+    noise = rng.normal(0, 1500, len(dates))
+    return np.maximum(base_sales + seasonal_factor + trend_factor + noise, 1000)  # Minimum sales threshold
+
+
+def generate_sales_chunks(rows=DEFAULT_SALES_ROWS, start_date=DEFAULT_START, end_date=DEFAULT_END,
+                          chunk_rows=DEFAULT_CHUNK_ROWS, rng=None):
+    """Yield sales DataFrames of roughly chunk_rows rows, in date order, totalling about rows"""
+    rng = rng or np.random.default_rng(42)
+    dates = pd.date_range(start=start_date, end=end_date, freq='D')
+    daily_sales = daily_sales_curve(dates, rng)
+
+    # Transactions per day are uniform around the average; at the default scale
+    # this is the original 5-14 records per day
+    rows_per_day = rows / len(dates)
+    low = max(1, int(round(rows_per_day * 5 / 9.5)))
+    high = max(low, int(round(rows_per_day * 14 / 9.5))) + 1
+    day_counts = rng.integers(low, high, len(dates))
+
+    # Group whole days into chunks so memory stays bounded by chunk_rows
+    chunk_ends = np.searchsorted(np.cumsum(day_counts), np.arange(chunk_rows, day_counts.sum(), chunk_rows))
+    for day_range in np.split(np.arange(len(dates)), np.unique(chunk_ends + 1)):
+        if len(day_range) == 0:
+            continue
+        day_index = np.repeat(day_range, day_counts[day_range])
+        n = len(day_index)
+        yield pd.DataFrame({
+            'Date': dates[day_index],
+            'Sales': daily_sales[day_index] / rng.integers(5, 15, n),
+            'Region': REGIONS[rng.choice(len(REGIONS), n, p=REGION_P)],
+            'Product_Category': CATEGORIES[rng.choice(len(CATEGORIES), n, p=CATEGORY_P)],
+            'Customer_Segment': SEGMENTS[rng.choice(len(SEGMENTS), n, p=SEGMENT_P)],
+            'Sales_Rep': SALES_REPS[rng.integers(0, len(SALES_REPS), n)],
+            'Channel': CHANNELS[rng.choice(len(CHANNELS), n, p=CHANNEL_P)]
+        })
+
+
+def generate_customer_chunks(num_customers=DEFAULT_CUSTOMERS, start_date=DEFAULT_START,
+                             chunk_rows=DEFAULT_CHUNK_ROWS, rng=None):
+    """Yield customer DataFrames with segment-correlated purchases and satisfaction"""
+    rng = rng or np.random.default_rng(43)
+    start = np.datetime64(start_date, 'D')
+    for first in range(0, num_customers, chunk_rows):
+        n = min(chunk_rows, num_customers - first)
+        segment = rng.choice(len(SEGMENTS), n, p=SEGMENT_P)
+        offset, scale, base_satisfaction = SEGMENT_PROFILES[segment].T
+
         # Correlation between segment and purchases/satisfaction
-        if segment == 'Premium':
-            total_purchases = np.random.exponential(8) + 5
-            base_satisfaction = 7.5
-        elif segment == 'Standard':
-            total_purchases = np.random.exponential(4) + 2
-            base_satisfaction = 6.5
-        else:  # Budget
-            total_purchases = np.random.exponential(2) + 1
-            base_satisfaction = 5.5
-        
-        satisfaction = min(10, max(1, np.random.normal(base_satisfaction, 1.5)))
-        
-        customer_data.append({
-            'Customer_ID': f"CUST_{i:05d}",
-            'Age': age,
-            'Gender': np.random.choice(['Male', 'Female']),
-            'Region': region,
-            'Customer_Segment': segment,
-            'Total_Purchases': round(total_purchases, 2),
-            'Satisfaction_Score': round(satisfaction, 1),
-            'Join_Date': start_date + timedelta(days=np.random.randint(0, 730)),
-            'Last_Purchase': start_date + timedelta(days=np.random.randint(0, 730))
+        total_purchases = rng.exponential(scale) + offset
+        satisfaction = np.clip(rng.normal(base_satisfaction, 1.5), 1, 10)
+
+        yield pd.DataFrame({
+            'Customer_ID': [f"CUST_{i:05d}" for i in range(first + 1, first + n + 1)],
+            'Age': np.maximum(18, rng.normal(40, 15, n).astype(int)),
+            'Gender': np.array(['Male', 'Female'], dtype=object)[rng.integers(0, 2, n)],
+            'Region': REGIONS[rng.integers(0, len(REGIONS), n)],
+            'Customer_Segment': SEGMENTS[segment],
+            'Total_Purchases': total_purchases.round(2),
+            'Satisfaction_Score': satisfaction.round(1),
+            'Join_Date': start + rng.integers(0, 730, n),
+            'Last_Purchase': start + rng.integers(0, 730, n)
         })
-    
-    customer_df = pd.DataFrame(customer_data)
-    
-    # Product Data
+
+
+def generate_product_data(start_date=DEFAULT_START, rng=None):
+    """Build the product performance table"""
+    rng = rng or np.random.default_rng(44)
     products = [
         'Smartphone Pro', 'Laptop Ultra', 'Wireless Headphones', 'Smart Watch',
         'Gaming Console', 'Tablet Plus', 'Camera DSLR', 'Bluetooth Speaker',
@@ -82,23 +117,23 @@ def generate_business_data():
         'Garden Tools Set', 'Kitchen Mixer', 'Outdoor Furniture', 'LED TV',
         'Fitness Tracker', 'Desk Organizer', 'Travel Backpack', 'Coffee Maker'
     ]
-    
+
     product_data = []
     for product in products:
         category = 'Electronics' if any(x in product.lower() for x in ['smartphone', 'laptop', 'headphones', 'watch', 'console', 'tablet', 'camera', 'speaker', 'tv', 'tracker']) else \
                   'Clothing' if any(x in product.lower() for x in ['jacket', 'shoes', 'shirt', 'jeans']) else \
                   'Home & Garden' if any(x in product.lower() for x in ['garden', 'kitchen', 'furniture', 'desk', 'coffee']) else \
                   'Sports' if any(x in product.lower() for x in ['fitness', 'running']) else 'Other'
-        
-        base_price = np.random.uniform(50, 500) if category == 'Electronics' else \
-                    np.random.uniform(30, 200) if category == 'Clothing' else \
-                    np.random.uniform(40, 300)
-        
-        units_sold = np.random.randint(100, 2000)
+
+        base_price = rng.uniform(50, 500) if category == 'Electronics' else \
+                    rng.uniform(30, 200) if category == 'Clothing' else \
+                    rng.uniform(40, 300)
+
+        units_sold = int(rng.integers(100, 2000))
         revenue = base_price * units_sold
-        profit_margin = np.random.uniform(0.15, 0.45)
-        customer_rating = np.random.uniform(3.5, 5.0)
-        
+        profit_margin = rng.uniform(0.15, 0.45)
+        customer_rating = rng.uniform(3.5, 5.0)
+
         product_data.append({
             'Product': product,
             'Category': category,
@@ -107,21 +142,92 @@ def generate_business_data():
             'Avg_Price': round(base_price, 2),
             'Profit_Margin': round(profit_margin, 3),
             'Customer_Rating': round(customer_rating, 1),
-            'Launch_Date': start_date + timedelta(days=np.random.randint(0, 365))
+            'Launch_Date': start_date + timedelta(days=int(rng.integers(0, 365)))
         })
-    
-    product_df = pd.DataFrame(product_data)
-    
-    # Save data to CSV files
-    sales_df.to_csv('sales_data.csv', index=False)
-    customer_df.to_csv('customer_data.csv', index=False)
-    product_df.to_csv('product_data.csv', index=False)
-    
+
+    return pd.DataFrame(product_data)
+
+
+def write_chunks(chunks, path):
+    """Write DataFrame chunks to one CSV, returning (row count, sum of Sales if present)"""
+    rows, total = 0, 0.0
+    for index, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0,
+                     index=False, date_format='%Y-%m-%d')
+        rows += len(chunk)
+        if 'Sales' in chunk:
+            total += chunk['Sales'].sum()
+    return rows, total
+
+
+def write_month_partitions(chunks, directory):
+    """Write date-ordered sales chunks to one CSV per month (directory/YYYY-MM.csv)
+
+    Returns (row count, sum of Sales) like write_chunks.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for stale in glob.glob(os.path.join(directory, '*.csv')):
+        os.remove(stale)
+
+    written = set()
+    rows, total = 0, 0.0
+    for chunk in chunks:
+        # A chunk can span a month boundary; chunks arrive in date order, so each
+        # partition is only ever appended to
+        for month, part in chunk.groupby(chunk['Date'].dt.strftime('%Y-%m'), sort=True):
+            path = os.path.join(directory, f"{month}.csv")
+            part.to_csv(path, mode='a' if path in written else 'w', header=path not in written,
+                        index=False, date_format='%Y-%m-%d')
+            written.add(path)
+        rows += len(chunk)
+        total += chunk['Sales'].sum()
+    return rows, total
+
+
+def generate_business_data(rows=DEFAULT_SALES_ROWS, num_customers=DEFAULT_CUSTOMERS,
+                           start_date=DEFAULT_START, end_date=DEFAULT_END,
+                           chunk_rows=DEFAULT_CHUNK_ROWS, seed=42, output_dir='.',
+                           partition_by=None):
+    """Generate realistic business data for dashboard demonstration"""
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    sales_chunks = generate_sales_chunks(rows, start_date, end_date, chunk_rows, rng)
+    if partition_by == 'month':
+        sales_rows, total_revenue = write_month_partitions(
+            sales_chunks, os.path.join(output_dir, 'sales_data'))
+    else:
+        sales_rows, total_revenue = write_chunks(sales_chunks, os.path.join(output_dir, 'sales_data.csv'))
+    customer_rows, _ = write_chunks(
+        generate_customer_chunks(num_customers, start_date, chunk_rows, rng),
+        os.path.join(output_dir, 'customer_data.csv'))
+    product_df = generate_product_data(start_date, rng)
+    product_df.to_csv(os.path.join(output_dir, 'product_data.csv'), index=False)
+
     print("Data generation complete!")
-    print(f"Generated {len(sales_df)} sales records")
-    print(f"Generated {len(customer_df)} customer records")
+    print(f"Generated {sales_rows} sales records")
+    print(f"Generated {customer_rows} customer records")
     print(f"Generated {len(product_df)} product records")
-    print(f"Total Revenue: ${sales_df['Sales'].sum():,.2f}")
+    print(f"Total Revenue: ${total_revenue:,.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sample business data for the dashboard")
+    parser.add_argument('--rows', type=parse_count, default=DEFAULT_SALES_ROWS,
+                        help="approximate number of sales rows, e.g. 6949, 10M, 100M")
+    parser.add_argument('--customers', type=parse_count, default=DEFAULT_CUSTOMERS,
+                        help="number of customer records")
+    parser.add_argument('--start-date', type=parse_date, default=DEFAULT_START)
+    parser.add_argument('--end-date', type=parse_date, default=DEFAULT_END)
+    parser.add_argument('--chunk-rows', type=parse_count, default=DEFAULT_CHUNK_ROWS,
+                        help="rows generated and written per chunk; bounds peak memory")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--partition-by', choices=['month'],
+                        help="write sales as sales_data/YYYY-MM.csv partitions instead of sales_data.csv")
+    args = parser.parse_args()
+    generate_business_data(args.rows, args.customers, args.start_date, args.end_date,
+                           args.chunk_rows, args.seed, args.output_dir, args.partition_by)
 
 if __name__ == "__main__":
-    generate_business_data()
+    main()
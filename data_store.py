@@ -0,0 +1,93 @@
+"""
+Parsing and cache bookkeeping for the dashboard CSV files
+
+The CSVs are parsed with the dashboard column types here; the typed result is
+kept in the memory-mapped column store (column_store.py) under the cache
+directory and rebuilt whenever the source file's mtime or size changes.
+"""
+
+import io
+import os
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR', '.dashboard_cache')
+
+
+def source_signature(path):
+    """Return the (mtime, size) signature used to detect a changed source file"""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def cache_stem(path):
+    """Name under which files derived from path are cached
+
+    Partition files are named after their directory too: sales_data/2023-01.csv -> sales_data__2023-01
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    parent = os.path.basename(os.path.dirname(path))
+    if parent:
+        stem = f"{parent}__{stem}"
+    return stem
+
+
+class _Prefix(io.RawIOBase):
+    """The first nbytes bytes of a binary file, read as if the file ended there"""
+
+    def __init__(self, f, nbytes):
+        self.f = f
+        self.remaining = nbytes
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        read = self.f.readinto(memoryview(buffer)[:size])
+        self.remaining -= read
+        return read
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+def open_prefix(path, nbytes=None):
+    """Open a file for binary reading, stopping after its first nbytes bytes if given
+
+    A file that is being appended to is parsed up to a fixed offset this way,
+    so rows written during the parse are left for the next read.
+    """
+    f = open(path, 'rb')
+    if nbytes is None:
+        return f
+    return io.BufferedReader(_Prefix(f, nbytes))
+
+
+def parse_csv(path, date_columns=(), categorical_columns=(), nbytes=None):
+    """Parse a CSV file (or its first nbytes bytes) and apply the dashboard column types"""
+    dtype = {col: 'category' for col in categorical_columns}
+    if nbytes is None:
+        frame = pd.read_csv(path, dtype=dtype)
+    else:
+        with open_prefix(path, nbytes) as f:
+            frame = pd.read_csv(f, dtype=dtype)
+    return _parse_dates(frame, date_columns)
+
+
+def parse_csv_chunks(path, chunk_rows, date_columns=(), categorical_columns=(), nbytes=None):
+    """Yield a CSV file (or its first nbytes bytes) as frames of at most chunk_rows rows, typed like parse_csv"""
+    with open_prefix(path, nbytes) as f, \
+            pd.read_csv(f, chunksize=chunk_rows,
+                        dtype={col: 'category' for col in categorical_columns}) as reader:
+        for frame in reader:
+            yield _parse_dates(frame, date_columns)
+
+
+def _parse_dates(frame, date_columns):
+    for col in date_columns:
+        frame[col] = pd.to_datetime(frame[col])
+    return frame
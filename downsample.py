@@ -0,0 +1,87 @@
+"""
+Point-budget helpers for the sales trend chart
+
+``resample_trend`` picks a day, week or month grain from the span of the
+selection and a target point count, sums the daily series into those
+buckets, and finally applies Largest-Triangle-Three-Buckets downsampling so
+the line never carries more than ``max_points`` points.
+"""
+
+import os
+
+import numpy as np
+
+TREND_GRAIN = os.environ.get('DASHBOARD_TREND_GRAIN', 'auto')
+TREND_TARGET_POINTS = int(os.environ.get('DASHBOARD_TREND_TARGET_POINTS', 1000))
+TREND_MAX_POINTS = int(os.environ.get('DASHBOARD_TREND_MAX_POINTS', 1000))
+
+GRAIN_DAYS = {'day': 1, 'week': 7, 'month': 30.44}
+
+
+def choose_grain(span_days, target_points=TREND_TARGET_POINTS):
+    """Return the finest of day/week/month that keeps the bucket count within target_points"""
+    for grain, days in GRAIN_DAYS.items():
+        if span_days / days <= target_points:
+            return grain
+    return 'month'
+
+
+def bucket_days(days, grain):
+    """Map day ordinals to the first day of their week (Monday) or month"""
+    days = np.asarray(days, dtype=np.int64)
+    if grain == 'week':
+        # Day 0 (1970-01-01) was a Thursday
+        return days - (days + 3) % 7
+    if grain == 'month':
+        months = days.astype('datetime64[D]').astype('datetime64[M]')
+        return months.astype('datetime64[D]').astype(np.int64)
+    return days
+
+
+def lttb(x, y, threshold):
+    """Indexes of the points kept by Largest-Triangle-Three-Buckets downsampling"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                       (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def resample_trend(days, sales, grain=TREND_GRAIN, target_points=TREND_TARGET_POINTS,
+                   max_points=TREND_MAX_POINTS):
+    """Bucket a daily sales series and cap its length
+
+    Returns (bucket start day ordinals, summed sales, grain used).
+    """
+    days = np.asarray(days, dtype=np.int64)
+    sales = np.asarray(sales, dtype=np.float64)
+    if len(days) == 0:
+        return days, sales, 'day' if grain == 'auto' else grain
+
+    if grain == 'auto':
+        grain = choose_grain(days[-1] - days[0] + 1, target_points)
+    if grain != 'day':
+        buckets, inverse = np.unique(bucket_days(days, grain), return_inverse=True)
+        days, sales = buckets, np.bincount(inverse, weights=sales)
+
+    keep = lttb(days, sales, max_points)
+    return days[keep], sales[keep], grain
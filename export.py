@@ -0,0 +1,110 @@
+"""
+Streaming exports of the raw sales rows behind the dashboard's selection
+
+``export_chunks`` walks a sales source's raw tables for a date range (each
+source prunes by its day index: the memory-mapped column store, the month
+partitions or the CSV chunks) and yields the rows matching the region and
+category filters in chunks of about DASHBOARD_EXPORT_CHUNK_ROWS. ``csv_stream``
+and ``parquet_stream`` encode those chunks one at a time, so an export holds
+one chunk in memory however many rows it returns. Parquet needs ``pyarrow``.
+"""
+
+import io
+import os
+
+import numpy as np
+
+from sales_table import DIMENSIONS, SalesTable
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('DASHBOARD_EXPORT_CHUNK_ROWS', 50_000))
+EXPORT_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def export_chunks(sales_source, start_day=None, end_day=None, equals=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Matching raw rows in day order, as SalesTables of up to about chunk_rows rows"""
+    pending, pending_rows = [], 0
+    for table in sales_source.iter_tables(start_day, end_day):
+        # Filter slice by slice, so the mask and the copy stay chunk-sized, and gather
+        # the matches of selective filters into full chunks
+        for offset in range(0, len(table), chunk_rows):
+            matched = table.take(slice(offset, offset + chunk_rows)).select(equals=equals)
+            if len(matched):
+                pending.append(matched)
+                pending_rows += len(matched)
+            if pending_rows >= chunk_rows:
+                yield SalesTable.concat(pending)
+                pending, pending_rows = [], 0
+    if pending:
+        yield SalesTable.concat(pending)
+
+
+def csv_stream(chunks):
+    """CSV text of the chunks, in the sales_data.csv layout, one chunk at a time"""
+    header = True
+    for chunk in chunks:
+        buffer = io.StringIO()
+        chunk.to_frame().to_csv(buffer, index=False, header=header, date_format='%Y-%m-%d')
+        header = False
+        yield buffer.getvalue()
+    if header:
+        yield ','.join(['Date', 'Sales'] + DIMENSIONS) + '\n'
+
+
+class _Drain:
+    """Write-only file for ParquetWriter whose written bytes are taken out after each row group"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([('Date', pa.date32()), ('Sales', pa.float64())] +
+                     [(column, pa.dictionary(pa.int32(), pa.string())) for column in DIMENSIONS])
+
+
+def _arrow_table(chunk, schema):
+    columns = [pa.array(chunk.day.astype(np.int32), type=pa.date32()), pa.array(chunk.sales)]
+    for column in DIMENSIONS:
+        columns.append(pa.DictionaryArray.from_arrays(
+            pa.array(chunk.codes[column].astype(np.int32)),
+            pa.array(chunk.dictionaries[column].tolist(), type=pa.string())))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def parquet_stream(chunks):
+    """Parquet file of the chunks, one row group per chunk, yielded as each is written"""
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = _arrow_schema()
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(_arrow_table(chunk, schema))
+            yield sink.take()
+    yield sink.take()
@@ -0,0 +1,200 @@
+"""
+Sales rep and channel leaderboards for any dashboard selection
+
+A ``Leaderboard`` keeps cubes of one column (Sales_Rep or Channel) by day,
+region and category, and a ``RunningTopK`` of the column's all-time totals.
+The cubes are the sales source's per-file cubes, memory-mapped from column
+stores, plus one small cube per batch of appended rows (merged every
+MAX_APPENDED_CUBES batches), so neither a start nor an append rebuilds the
+history. The unfiltered leaderboard is read straight from the running top-k;
+a filtered one sums the selected cells per label and picks the k largest
+with a partial partition, never sorting more than the k leaders, so tens of
+thousands of reps cost one bincount per request.
+
+``build_leaderboards`` loads the boards from a sales source's cubes and
+subscribes them to its refreshes.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from sales_table import SalesTable
+
+LEADERBOARD_COLUMNS = ['Sales_Rep', 'Channel']
+LEADERBOARD_SIZE = int(os.environ.get('DASHBOARD_LEADERBOARD_SIZE', 10))
+# Cube dimensions besides the leaderboard column: the ones the dashboard filters on
+FILTER_COLUMNS = ['Region', 'Product_Category']
+# Cubes of appended rows kept apart before they are merged into one
+MAX_APPENDED_CUBES = 32
+
+
+def top_k(values, k):
+    """Indexes of the k largest values, largest first, without sorting the rest"""
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-values, k - 1)[:k]
+    return top[np.argsort(-values[top], kind='stable')]
+
+
+class RunningTopK:
+    """Running per-label totals with the k largest kept current as totals are added
+
+    Labels get consecutive ids as they are first seen; the totals grow in
+    place, with capacity doubled when it runs out. While every addition is
+    non-negative a total can only grow, so the new leaders are among the old
+    leaders and the labels just added to; only a negative addition (a refund
+    batch) needs a partition over every label.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._labels = np.empty(0, dtype=object)
+        self._sales = np.empty(0, dtype=np.float64)
+        self._count = np.empty(0, dtype=np.int64)
+        self.leaders = np.empty(0, dtype=np.int64)
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def labels(self):
+        return self._labels[:len(self)]
+
+    @property
+    def sales(self):
+        return self._sales[:len(self)]
+
+    @property
+    def count(self):
+        return self._count[:len(self)]
+
+    def ids(self, labels):
+        """Ids of the labels, registering the ones not seen before with zero totals"""
+        known = len(self)
+        ids = np.fromiter((self._ids.setdefault(label, len(self._ids)) for label in labels),
+                          dtype=np.int64, count=len(labels))
+        if len(self) > known:
+            if len(self) > len(self._sales):
+                capacity = max(len(self), 2 * len(self._sales))
+                self._labels = np.concatenate([self._labels, np.empty(capacity - len(self._labels), dtype=object)])
+                self._sales = np.concatenate([self._sales, np.zeros(capacity - len(self._sales))])
+                self._count = np.concatenate([self._count, np.zeros(capacity - len(self._count), dtype=np.int64)])
+            new = ids >= known
+            self._labels[ids[new]] = np.asarray(labels, dtype=object)[new]
+        return ids
+
+    def add(self, ids, sales, count):
+        """Add sales and transaction totals to the labels of ids (each id at most once)"""
+        self._sales[ids] += sales
+        self._count[ids] += count
+        if np.all(np.asarray(sales) >= 0):
+            candidates = np.union1d(self.leaders, ids)
+            self.leaders = candidates[top_k(self.sales[candidates], self.k)]
+        else:
+            self.leaders = top_k(self.sales, self.k)
+
+
+class Leaderboard:
+    """Top labels of one column by sales, for the whole history or a filtered selection"""
+
+    def __init__(self, column, k=LEADERBOARD_SIZE, cubes=()):
+        self.column = column
+        self.k = k
+        self.columns = FILTER_COLUMNS + [column]
+        self.running = RunningTopK(k)
+        # Day-sorted cubes with the running ids of their column's labels; replaced, never
+        # changed in place, so top() can read them outside the lock
+        self._cubes = []
+        self._appended = 0
+        self._days = (None, None)
+        self._lock = threading.Lock()
+        for cube in cubes:
+            self._add_cube(cube)
+
+    def _add_cube(self, cube):
+        if len(cube) == 0:
+            return
+        ids = self.running.ids(cube.dictionaries[self.column])
+        label_ids = ids[cube.codes[self.column]]
+        sales = np.bincount(label_ids, weights=cube.sales, minlength=len(self.running))
+        count = np.bincount(label_ids, weights=cube.count, minlength=len(self.running)).round().astype(np.int64)
+        present = np.flatnonzero(count)
+        self.running.add(present, sales[present], count[present])
+        self._cubes = self._cubes + [(cube, ids)]
+        first_day, last_day = self._days
+        self._days = (cube.first_day if first_day is None else min(first_day, cube.first_day),
+                      cube.last_day if last_day is None else max(last_day, cube.last_day))
+
+    def add(self, table):
+        """Fold raw sales rows into the cubes and the running totals"""
+        cells = table.rollup(self.columns)
+        with self._lock:
+            self._add_cube(cells)
+            if len(cells):
+                self._appended += 1
+            if self._appended > MAX_APPENDED_CUBES:
+                # Merge the appended cubes, so requests sum a bounded number of cubes
+                base, appended = self._cubes[:-self._appended], self._cubes[-self._appended:]
+                merged = SalesTable.concat([cube for cube, _ in appended]).sorted_by_day().rollup(self.columns)
+                self._cubes = base + [(merged, self.running.ids(merged.dictionaries[self.column]))]
+                self._appended = 1
+
+    def _records(self, labels, sales, count):
+        return [{'Rank': rank, self.column: label, 'Total_Sales': round(float(total)),
+                 'Transactions': int(transactions), 'Avg_Transaction': round(float(total / transactions))}
+                for rank, (label, total, transactions) in enumerate(zip(labels, sales, count), start=1)]
+
+    def top(self, start_day=None, end_day=None, equals=None):
+        """Table records of the k labels with the most sales in the selection"""
+        with self._lock:
+            cubes, labels, (first_day, last_day) = self._cubes, self.running.labels, self._days
+            if not cubes:
+                return []
+            whole_history = ((start_day is None or start_day <= first_day) and
+                             (end_day is None or end_day >= last_day))
+            if not equals and whole_history:
+                running, leaders = self.running, self.running.leaders
+                return self._records(running.labels[leaders], running.sales[leaders], running.count[leaders])
+
+        label_ids, cell_sales, cell_count = [], [], []
+        for cube, ids in cubes:
+            selected = cube.select(start_day, end_day, equals)
+            label_ids.append(ids[selected.codes[self.column]])
+            cell_sales.append(selected.sales)
+            cell_count.append(selected.count)
+        label_ids = np.concatenate(label_ids)
+        # bincount of an empty selection is integer, so cast for the -inf below
+        sales = np.bincount(label_ids, weights=np.concatenate(cell_sales), minlength=len(labels)).astype(np.float64)
+        count = np.bincount(label_ids, weights=np.concatenate(cell_count),
+                            minlength=len(labels)).round().astype(np.int64)
+        # Labels without rows in the selection never rank, whatever their sign
+        sales[count == 0] = -np.inf
+        leaders = top_k(sales, self.k)
+        leaders = leaders[count[leaders] > 0]
+        return self._records(labels[leaders], sales[leaders], count[leaders])
+
+
+def _load(sales_source, columns, k):
+    # One call for every board, so a streamed source missing the cubes reads its file once
+    cubes = sales_source.cubes([FILTER_COLUMNS + [column] for column in columns])
+    return {column: Leaderboard(column, k, column_cubes) for column, column_cubes in zip(columns, cubes)}
+
+
+def build_leaderboards(sales_source, columns=LEADERBOARD_COLUMNS, k=LEADERBOARD_SIZE):
+    """Leaderboards of the columns, kept up to date with the source's refreshes"""
+    boards = _load(sales_source, columns, k)
+
+    def on_rows(table):
+        if table is None:
+            # The source was reloaded: rebuild the boards, then swap each in whole
+            boards.update(_load(sales_source, columns, k))
+        else:
+            for board in boards.values():
+                board.add(table)
+
+    sales_source.add_listener(on_rows)
+    return boards
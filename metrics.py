@@ -0,0 +1,256 @@
+"""
+Timing instrumentation for the dashboard hot path
+
+``span(name)`` times one stage of a request (filtering, aggregation, figure
+building, serialization) into a per-stage latency histogram and into the
+current request's list of spans. ``instrument(server)`` adds those spans to
+every response as a ``Server-Timing`` header and serves all histograms in
+the Prometheus text format at ``/metrics``. Metrics are kept per process, so
+with several workers each scrape sees the worker that answered it.
+
+Setting ``DASHBOARD_PROFILE_SLOW_MS`` turns on a sampling profiler: a
+background thread samples the stacks of in-flight requests every
+``DASHBOARD_PROFILE_INTERVAL_MS`` and requests slower than the threshold
+have their samples written as collapsed stacks (flamegraph.pl / speedscope
+input) to ``DASHBOARD_PROFILE_DIR``.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from data_store import CACHE_DIR
+
+PROFILE_SLOW_MS = float(os.environ.get('DASHBOARD_PROFILE_SLOW_MS', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('DASHBOARD_PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('DASHBOARD_PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles'))
+
+# Upper bounds in seconds, from sub-millisecond cube selections to multi-second cold builds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with one series per label value"""
+
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: (list(counts), total) for value, (counts, total) in self._series.items()}
+        for value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+stage_seconds = Histogram('dashboard_stage_seconds', "Time spent in each stage of a callback", 'stage')
+callback_seconds = Histogram('dashboard_callback_seconds', "Latency of each Dash callback", 'callback')
+request_seconds = Histogram('dashboard_request_seconds', "Latency of HTTP requests by route", 'route')
+
+# Extra gauges/counters, added by the app: name -> (type, help, function returning {label: value})
+_collectors = {}
+
+_local = threading.local()
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(name, elapsed)
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def in_request(function):
+    """Wrap function so that its spans count towards the calling thread's request wherever it runs
+
+    Spans are kept per thread, so work handed to a pool thread would
+    otherwise time stages of no request.
+    """
+    spans = getattr(_local, 'spans', None)
+
+    def wrapper(*args, **kwargs):
+        outer = getattr(_local, 'spans', None)
+        _local.spans = spans
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.spans = outer
+    return wrapper
+
+
+def timed_callback(function):
+    """Record the latency of a Dash callback, with its total as a span of the request"""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            callback_seconds.observe(function.__name__, elapsed)
+            spans = getattr(_local, 'spans', None)
+            if spans is not None:
+                spans.append((function.__name__, elapsed))
+    return wrapper
+
+
+def add_collector(name, metric_type, help_text, label, collect):
+    """Expose the {label value: number} dict returned by collect() at /metrics"""
+    _collectors[name] = (metric_type, help_text, label, collect)
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text exposition format"""
+    lines = []
+    for histogram in (callback_seconds, stage_seconds, request_seconds):
+        lines.extend(histogram.render())
+    for name, (metric_type, help_text, label, collect) in _collectors.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        lines += [f'{name}{{{label}="{value}"}} {number}' for value, number in collect().items()]
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing(spans):
+    """Server-Timing header value for a list of (name, seconds) spans"""
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered request threads from one background thread"""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, slow_ms=PROFILE_SLOW_MS, directory=PROFILE_DIR):
+        self.interval = interval_ms / 1000
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_running(self):
+        # Threads do not survive a fork, so a preloading server's workers each start their own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='dashboard-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            stacks = [(thread_id, samples, collapse_stack(frames[thread_id]))
+                      for thread_id, samples in active.items() if thread_id in frames]
+            # Count under the lock, and only for threads still sampled: stop() hands a
+            # thread's counter to the writer once it is out of _active
+            with self._lock:
+                for thread_id, samples, stack in stacks:
+                    if self._active.get(thread_id) is samples:
+                        samples[stack] += 1
+
+    def start(self):
+        """Begin sampling the calling thread"""
+        with self._lock:
+            self._ensure_running()
+            self._active[threading.get_ident()] = Counter()
+
+    def stop(self, label, elapsed):
+        """Stop sampling the calling thread; write its samples if the request was slow"""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or elapsed * 1000 < self.slow_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_')
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                            f"{safe_label}-{elapsed * 1000:.0f}ms.folded")
+        with open(path, 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+        print(f"Slow request ({elapsed * 1000:,.0f} ms): profile written to {path}")
+        return path
+
+
+def collapse_stack(frame):
+    """'outer;...;inner' function names of a frame's stack, as used by flame graph tools"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def instrument(server, profile_slow_ms=PROFILE_SLOW_MS):
+    """Add Server-Timing headers, the /metrics route and the optional profiler to a Flask server"""
+    from flask import Response, request
+
+    profiler = SamplingProfiler(slow_ms=profile_slow_ms) if profile_slow_ms > 0 else None
+
+    @server.before_request
+    def start_request_timing():
+        _local.spans = []
+        _local.started = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+
+    @server.after_request
+    def add_server_timing(response):
+        started = getattr(_local, 'started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        spans = _local.spans + [('total', elapsed)]
+        _local.spans = _local.started = None
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(route, elapsed)
+        response.headers['Server-Timing'] = server_timing(spans)
+        if profiler is not None:
+            profiler.stop(request.path, elapsed)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    if profiler is not None:
+        print(f"Sampling profiler on: requests over {profile_slow_ms:,.0f} ms are written to {profiler.directory}")
@@ -0,0 +1,142 @@
+"""
+Compact encoding and compression of callback responses
+
+Numeric trace arrays are rounded to cents before they are sent, so the JSON
+carries "1593634510.86" rather than "1593634510.860178", and trend dates are
+sent as plain "YYYY-MM-DD" strings. Where the browser's plotly.js reads
+base64 typed arrays (2.28 and later) numeric arrays are sent as
+``{"dtype": "f8", "bdata": ...}`` instead of decimal text. ``compress_responses``
+gzips, or brotli-compresses where the ``brotli`` package is installed, every
+JSON, HTML and text response the browser accepts compressed.
+"""
+
+import base64
+import gzip
+import json
+import os
+import re
+
+import numpy as np
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# '0' sends trace arrays exactly as the figure builders produce them
+COMPACT_PAYLOADS = os.environ.get('DASHBOARD_COMPACT_PAYLOADS', '1') != '0'
+# 'auto' uses typed arrays when the bundled plotly.js supports them; 'on' or 'off' forces it
+TYPED_ARRAYS = os.environ.get('DASHBOARD_TYPED_ARRAYS', 'auto')
+VALUE_DECIMALS = 2
+TYPED_ARRAYS_PLOTLY_JS = (2, 28)
+
+COMPRESS_MIN_BYTES = int(os.environ.get('DASHBOARD_COMPRESS_MIN_BYTES', 1024))
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/plain', 'text/css',
+                      'application/javascript'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def bundled_plotly_js_version():
+    """(major, minor) of the plotly.js served by dcc.Graph, or None if it cannot be read"""
+    try:
+        import dash
+        path = os.path.join(os.path.dirname(dash.__file__), 'dcc', 'plotly.min.js')
+        with open(path, 'rb') as f:
+            header = f.read(200).decode('ascii', 'replace')
+    except (ImportError, OSError):
+        return None
+    match = re.search(r'plotly\.js v(\d+)\.(\d+)', header)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _typed_arrays_supported():
+    if TYPED_ARRAYS != 'auto':
+        return TYPED_ARRAYS == 'on'
+    version = bundled_plotly_js_version()
+    return version is not None and version >= TYPED_ARRAYS_PLOTLY_JS
+
+
+USE_TYPED_ARRAYS = _typed_arrays_supported()
+# Part of the result cache version, so cached responses match the encoding in use
+if not COMPACT_PAYLOADS:
+    PAYLOAD_FORMAT = 'plain'
+else:
+    PAYLOAD_FORMAT = 'typed' if USE_TYPED_ARRAYS else 'compact'
+
+
+def typed_array(values):
+    """plotly.js base64 typed array of a numeric array (little-endian f8, or i4 for integers)"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu' and (values.size == 0 or np.abs(values).max() < 2**31):
+        dtype, data = 'i4', values.astype('<i4')
+    else:
+        dtype, data = 'f8', values.astype('<f8')
+    return {'dtype': dtype, 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+
+
+def encode_numbers(values, decimals=VALUE_DECIMALS):
+    """A numeric trace array in the most compact form the browser can read"""
+    if not COMPACT_PAYLOADS:
+        return values
+    values = np.round(np.asarray(values, dtype=np.float64), decimals)
+    return typed_array(values) if USE_TYPED_ARRAYS else values
+
+
+def encode_dates(dates):
+    """Calendar dates as 'YYYY-MM-DD' strings instead of full timestamps"""
+    if not COMPACT_PAYLOADS:
+        return dates
+    days = np.asarray(dates).astype('datetime64[D]')
+    return np.datetime_as_string(days, unit='D').tolist()
+
+
+def loads(text):
+    """Parse cached JSON text, with orjson where it is installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def compress(body, encoding):
+    """Compress a response body with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def choose_encoding(accept_encodings):
+    """Preferred content coding the client accepts: brotli where available, else gzip, else None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_responses(server, min_bytes=COMPRESS_MIN_BYTES):
+    """Compress large text and JSON responses of a Flask server for clients that accept it"""
+    from flask import request
+
+    @server.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers
+                or not 200 <= response.status_code < 300):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None or response.content_length is None or response.content_length < min_bytes:
+            return response
+        with metrics.span('compress'):
+            response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,324 @@
+"""
+Query backends behind the dashboard's filter callback
+
+A backend answers one question: the per-day, per-region, per-category and
+per-segment roll-ups of the sales cube for a date range and optional region
+and category filters, as the frames ``SalesTable.aggregate`` returns.
+
+``CubeBackend`` is the reference: it selects and aggregates the sales
+source's in-memory cube with numpy. ``SQLiteBackend`` and ``DuckDBBackend``
+keep the cube in a local database file, add the cells of appended rows to it
+as they arrive, and push the predicates and all four roll-ups down as one
+SQL query; DuckDB runs it multi-threaded over columnar storage. Dimension
+values are stored as integer codes, with their labels in a side table.
+
+DASHBOARD_QUERY_BACKEND selects the backend (cube, sqlite or duckdb) and
+DASHBOARD_QUERY_DB the database file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from data_store import CACHE_DIR
+from sales_source import read_rows
+from sales_table import CUBE_DIMENSIONS, from_days, rollup_frame
+
+QUERY_BACKEND = os.environ.get('DASHBOARD_QUERY_BACKEND', 'cube')
+QUERY_DB = os.environ.get('DASHBOARD_QUERY_DB')
+
+ROLLUPS = ['Date'] + CUBE_DIMENSIONS
+# Column of each roll-up in the sales_cube table
+SQL_COLUMNS = {'Date': 'day', **{column: column.lower() for column in CUBE_DIMENSIONS}}
+
+
+class CubeBackend:
+    """Reference backend: numpy selection and aggregation of the in-memory cube"""
+
+    name = 'cube'
+
+    def __init__(self, sales_source):
+        self.sales_source = sales_source
+
+    def sync(self):
+        pass
+
+    def rollups(self, start_day, end_day, equals):
+        with metrics.span('filter'):
+            filtered = self.sales_source.cube(start_day, end_day).select(start_day, end_day, equals)
+        with metrics.span('aggregate'):
+            return filtered.aggregate(CUBE_DIMENSIONS)
+
+
+def _relation(stored, current):
+    """'newer', 'older' or None: how stored {file: byte offset} snapshot offsets relate to current ones
+
+    Sales files are append-only, so snapshots of files none of which has
+    shrunk below their offsets (been replaced) are ordered by the offsets.
+    """
+    if not stored or not current:
+        return None
+    for path in set(stored) | set(current):
+        if not os.path.exists(path) or max(stored.get(path, 0), current.get(path, 0)) > os.path.getsize(path):
+            return None
+    if all(stored.get(path, -1) >= offset for path, offset in current.items()):
+        return 'newer'
+    if all(current.get(path, -1) >= offset for path, offset in stored.items()):
+        return 'older'
+    return None
+
+
+def _cells_frame(cells, codes):
+    return pd.DataFrame({'day': cells.day.astype(np.int32),
+                         **{SQL_COLUMNS[c]: codes[c].astype(np.int32) for c in CUBE_DIMENSIONS},
+                         'sales': cells.sales, 'count': cells.count.astype(np.int64)})
+
+
+class SQLBackend:
+    """The cube in an embedded SQL database, queried with filter and roll-up pushdown
+
+    Several processes may share the file. The database records the version
+    of the source it holds and the byte offset of every sales file it covers.
+    When the source moves on by appended rows, only those rows are read back
+    from the files and their cells inserted, next to the cells already there
+    (the queries sum them). A cube another process has written from further
+    into the same files is newer and kept; the cube is rewritten whole only
+    when the files were replaced or cannot be compared.
+    """
+
+    name = None
+
+    def __init__(self, sales_source, path):
+        self.sales_source = sales_source
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.sync()
+
+    # Engine hooks
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _begin(self, conn):
+        """Start a transaction that holds the write lock from its first statement"""
+        raise NotImplementedError
+
+    def _insert_cells(self, conn, frame):
+        raise NotImplementedError
+
+    def _has_table(self, conn, table):
+        raise NotImplementedError
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # Loading
+
+    def _stored(self, conn):
+        """(version, file offsets) of the cube in the database, or (None, None)"""
+        if not self._has_table(conn, 'meta'):
+            return None, None
+        rows = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+        return rows.get('version'), json.loads(rows.get('offsets', 'null'))
+
+    def _write_meta(self, conn, version, offsets):
+        conn.execute('DELETE FROM meta')
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [('version', version), ('offsets', json.dumps(offsets))])
+
+    def _write_cube(self, conn, cube, version, offsets):
+        labels = [(column, code, str(label)) for column in CUBE_DIMENSIONS
+                  for code, label in enumerate(cube.dictionaries[column])]
+        dimension_columns = ', '.join(f"{SQL_COLUMNS[c]} INTEGER NOT NULL" for c in CUBE_DIMENSIONS)
+        for table in ('sales_cube', 'labels', 'meta'):
+            conn.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.execute(f'''CREATE TABLE sales_cube (day INTEGER NOT NULL, {dimension_columns},
+                                                  sales DOUBLE NOT NULL, count BIGINT NOT NULL)''')
+        self._insert_cells(conn, _cells_frame(cube, cube.codes))
+        conn.execute('CREATE INDEX sales_cube_day ON sales_cube (day)')
+        conn.execute('CREATE TABLE labels (dimension TEXT, code INTEGER, label TEXT)')
+        conn.executemany('INSERT INTO labels VALUES (?, ?, ?)', labels)
+        conn.execute('CREATE TABLE meta (key TEXT, value TEXT)')
+        self._write_meta(conn, version, offsets)
+
+    def _label_codes(self, conn, column, dictionary):
+        """Database codes of a dictionary's labels, adding the labels the database has not seen"""
+        known = dict(conn.execute('SELECT label, code FROM labels WHERE dimension = ?', (column,)).fetchall())
+        new = [(column, len(known) + position, label)
+               for position, label in enumerate(label for label in map(str, dictionary) if label not in known)]
+        if new:
+            conn.executemany('INSERT INTO labels VALUES (?, ?, ?)', new)
+            known.update((label, code) for _, code, label in new)
+        return np.array([known[str(label)] for label in dictionary], dtype=np.int32)
+
+    def _append_rows(self, conn, stored_offsets, offsets, version):
+        """Insert the cells of the rows between the stored offsets and the current ones"""
+        for path, end in offsets.items():
+            start = stored_offsets.get(path)
+            if start == end:
+                continue
+            rows = read_rows(path, start, end)
+            if rows is None:
+                continue
+            cells = rows.rollup(CUBE_DIMENSIONS)
+            codes = {column: self._label_codes(conn, column, cells.dictionaries[column])[cells.codes[column]]
+                     for column in CUBE_DIMENSIONS}
+            self._insert_cells(conn, _cells_frame(cells, codes))
+        self._write_meta(conn, version, offsets)
+
+    def sync(self):
+        """Bring the database up to the source's data version"""
+        if self.sales_source.version() == self._version:
+            return
+        with self._lock:
+            cube, offsets, version = self.sales_source.snapshot()
+            if version == self._version:
+                return
+            conn = self._connection()
+            # Decide and write in one transaction, so two processes catching up at
+            # once cannot both insert the same rows
+            self._begin(conn)
+            try:
+                stored_version, stored_offsets = self._stored(conn)
+                relation = _relation(stored_offsets, offsets)
+                if stored_version == version or relation == 'newer':
+                    pass
+                elif relation == 'older':
+                    self._append_rows(conn, stored_offsets, offsets, version)
+                else:
+                    print(f"Writing the sales cube ({len(cube):,} cells) to {self.path}")
+                    self._write_cube(conn, cube, version, offsets)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            self._version = version
+
+    # Queries
+
+    def rollup_query(self, start_day, end_day, equals):
+        """SQL and parameters computing every roll-up of the selected cells in one query
+
+        Labels are resolved against the database's own labels table, so the
+        query stays consistent with a cube another process has just rewritten.
+        """
+        predicates, params = [], []
+        if start_day is not None:
+            predicates.append('day >= ?')
+            params.append(int(start_day))
+        if end_day is not None:
+            predicates.append('day <= ?')
+            params.append(int(end_day))
+        for column, value in (equals or {}).items():
+            predicates.append(f"{SQL_COLUMNS[column]} = "
+                              f"(SELECT code FROM labels WHERE dimension = ? AND label = ?)")
+            params += [column, str(value)]
+        where = f"WHERE {' AND '.join(predicates)}" if predicates else ''
+        groups = ' UNION ALL '.join(
+            f"SELECT {index} AS rollup, '{name}' AS dimension, {SQL_COLUMNS[name]} AS code, "
+            f"SUM(sales) AS sales, SUM(count) AS count FROM selected GROUP BY {SQL_COLUMNS[name]}"
+            for index, name in enumerate(ROLLUPS))
+        # Group on the integer codes, then look up the few labels of the groups. Labels
+        # added by appends have codes out of label order, so order by the label itself
+        sql = (f"WITH selected AS (SELECT * FROM sales_cube {where}) "
+               f"SELECT g.rollup, g.code, l.label, g.sales, g.count FROM ({groups}) g "
+               f"LEFT JOIN labels l ON l.dimension = g.dimension AND l.code = g.code "
+               f"ORDER BY g.rollup, l.label, g.code")
+        return sql, params
+
+    def rollups(self, start_day, end_day, equals):
+        sql, params = self.rollup_query(start_day, end_day, equals)
+        with metrics.span('query'):
+            rows = self._connection().execute(sql, params).fetchall()
+        groups = {index: [] for index in range(len(ROLLUPS))}
+        for row in rows:
+            groups[row[0]].append(row[1:])
+        frames = {}
+        for index, name in enumerate(ROLLUPS):
+            codes, labels, sums, counts = zip(*groups[index]) if groups[index] else ([], [], [], [])
+            labels = from_days(codes) if name == 'Date' else np.asarray(labels, dtype=object)
+            frames[name] = rollup_frame(name, labels, np.asarray(sums, dtype=np.float64),
+                                        np.asarray(counts, dtype=np.int64))
+        return frames
+
+
+class SQLiteBackend(SQLBackend):
+    name = 'sqlite'
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        # Readers keep the old cube while another process rewrites it
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _begin(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+
+    def _has_table(self, conn, table):
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (table,)).fetchone() is not None
+
+    def _insert_cells(self, conn, frame):
+        conn.executemany(f"INSERT INTO sales_cube VALUES ({', '.join('?' * len(frame.columns))})",
+                         frame.itertuples(index=False, name=None))
+
+
+class DuckDBBackend(SQLBackend):
+    """DuckDB locks its file to one process: use it with one worker process and many threads"""
+
+    name = 'duckdb'
+
+    def __init__(self, sales_source, path):
+        import duckdb
+        self._database = duckdb.connect(path)
+        self._database_pid = os.getpid()
+        super().__init__(sales_source, path)
+
+    def _connect(self):
+        # One database instance per process, with a cursor per thread
+        if self._database_pid != os.getpid():
+            import duckdb
+            self._database = duckdb.connect(self.path)
+            self._database_pid = os.getpid()
+        return self._database.cursor()
+
+    def _begin(self, conn):
+        conn.execute('BEGIN TRANSACTION')
+
+    def _has_table(self, conn, table):
+        return conn.execute('SELECT 1 FROM information_schema.tables WHERE table_name = ?',
+                            (table,)).fetchone() is not None
+
+    def _insert_cells(self, conn, frame):
+        conn.register('cube_cells', frame)
+        conn.execute('INSERT INTO sales_cube SELECT * FROM cube_cells')
+        conn.unregister('cube_cells')
+
+
+def open_query_backend(sales_source, name=QUERY_BACKEND, path=QUERY_DB):
+    """Create the backend named by DASHBOARD_QUERY_BACKEND for a sales source"""
+    if name == 'duckdb':
+        try:
+            return DuckDBBackend(sales_source, path or os.path.join(CACHE_DIR, 'sales.duckdb'))
+        except ImportError:
+            print("duckdb is not installed; using the sqlite query backend")
+            name, path = 'sqlite', None
+    if name == 'sqlite':
+        return SQLiteBackend(sales_source, path or os.path.join(CACHE_DIR, 'sales.sqlite'))
+    if name == 'cube':
+        return CubeBackend(sales_source)
+    raise ValueError(f"Unknown query backend {name!r}; expected cube, sqlite or duckdb")
@@ -0,0 +1,182 @@
+"""
+Two-tier cache for dashboard callback results
+
+Results are stored as JSON text under a string key. The first tier is a
+bounded in-process LRU; the second is a SQLite file that several worker
+processes can share. Both tiers evict by total size, and entries written for
+an older dataset version are dropped when the data reloads.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from data_store import CACHE_DIR
+
+RESULT_CACHE_DB = os.environ.get('DASHBOARD_RESULT_CACHE_DB',
+                                 os.path.join(CACHE_DIR, 'results.sqlite'))
+MEMORY_CACHE_BYTES = int(float(os.environ.get('DASHBOARD_RESULT_CACHE_MEMORY_MB', 64)) * 2**20)
+DISK_CACHE_BYTES = int(float(os.environ.get('DASHBOARD_RESULT_CACHE_DISK_MB', 512)) * 2**20)
+
+
+class ResultCache:
+    """Bounded LRU in front of a shared SQLite store, keyed by (version, key)"""
+
+    def __init__(self, db_path=RESULT_CACHE_DB, memory_bytes=MEMORY_CACHE_BYTES,
+                 disk_bytes=DISK_CACHE_BYTES):
+        self.db_path = db_path
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.version = None
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._inherited = []
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                      'memory_evictions': 0, 'disk_evictions': 0}
+
+    # SQLite tier
+
+    def _connection(self):
+        if self.db_path is None:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid != os.getpid():
+            # Opened before a fork (e.g. a preloading server): SQLite connections must not be
+            # used, or closed, in the child, so keep it referenced and open a fresh one
+            self._inherited.append(conn)
+            conn = None
+        if conn is None:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                                    version TEXT NOT NULL,
+                                    key TEXT NOT NULL,
+                                    value TEXT NOT NULL,
+                                    size INTEGER NOT NULL,
+                                    accessed REAL NOT NULL,
+                                    PRIMARY KEY (version, key))''')
+                conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            except sqlite3.Error as e:
+                print(f"Result cache disk tier disabled: {e}")
+                self.db_path = None
+                return None
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _disk_get(self, key, version):
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute('SELECT value FROM results WHERE version = ? AND key = ?',
+                               (version, key)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE results SET accessed = ? WHERE version = ? AND key = ?',
+                             (time.time(), version, key))
+        except sqlite3.Error as e:
+            print(f"Result cache read failed: {e}")
+            return None
+        return None if row is None else row[0]
+
+    def _disk_set(self, key, value, version):
+        conn = self._connection()
+        if conn is None:
+            return
+        try:
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                         (version, key, value, len(value), time.time()))
+            self._disk_evict(conn)
+        except sqlite3.Error as e:
+            print(f"Result cache write failed: {e}")
+
+    def _disk_evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.disk_bytes:
+            return
+        # Drop least recently used rows until the store fits again
+        excess = total - self.disk_bytes
+        freed = 0
+        evicted = []
+        for version, key, size in conn.execute(
+                'SELECT version, key, size FROM results ORDER BY accessed'):
+            evicted.append((version, key))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM results WHERE version = ? AND key = ?', evicted)
+        self.stats['disk_evictions'] += len(evicted)
+
+    # In-process tier
+
+    def _memory_set(self, key, value):
+        size = len(value)
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = value
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.stats['memory_evictions'] += 1
+
+    # Public interface
+
+    def set_version(self, version):
+        """Switch to a new dataset version, dropping results computed for any other"""
+        with self._lock:
+            self.version = version
+            self._memory.clear()
+            self._memory_size = 0
+        conn = self._connection()
+        if conn is not None:
+            try:
+                conn.execute('DELETE FROM results WHERE version != ?', (version,))
+            except sqlite3.Error as e:
+                print(f"Result cache invalidation failed: {e}")
+
+    def get(self, key, version=None):
+        """Return the cached JSON text for key under version (default: the current one), or None on a miss"""
+        with self._lock:
+            version = self.version if version is None else version
+            value = self._memory.get(key) if version == self.version else None
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return value
+        value = self._disk_get(key, version)
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['disk_hits'] += 1
+                if version == self.version:
+                    self._memory_set(key, value)
+        return value
+
+    def set(self, key, value, version=None):
+        """Store value for key, computed from the data of version (default: the current one)
+
+        A result whose computation started before the last set_version is
+        not stored: it may come from the data that version replaced.
+        """
+        with self._lock:
+            if version is None:
+                version = self.version
+            elif version != self.version:
+                return
+            self._memory_set(key, value)
+        # Stored under its own version, so a switch after the check above cannot
+        # file it under the new one
+        self._disk_set(key, value, version)
@@ -2,31 +2,84 @@
 """
 Business Dashboard Startup Script
 Generates sample data and launches the interactive dashboard
+
+--mode dev (the default) runs Dash's debug server: one process with the
+auto-reloader. --mode production serves dashboard_advanced.server with
+gunicorn: the data is loaded once in the master process before the workers
+fork, and every worker handles requests on its own pool of threads. Where
+gunicorn is not available (Windows) waitress is used, with threads only.
 """
 
+import argparse
 import os
 import sys
 import subprocess
 from pathlib import Path
 
+DASHBOARD_DIR = Path(__file__).resolve().parent
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the business intelligence dashboard")
+    parser.add_argument('--mode', choices=['dev', 'production'],
+                        default=os.environ.get('DASHBOARD_MODE', 'dev'))
+    parser.add_argument('--host', default=os.environ.get('DASHBOARD_HOST', '127.0.0.1'),
+                        help="interface to listen on; 0.0.0.0 for all (production mode)")
+    parser.add_argument('--port', type=int, default=int(os.environ.get('DASHBOARD_PORT', 8050)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('DASHBOARD_WORKERS', os.cpu_count() or 1)),
+                        help="worker processes in production mode (default: one per CPU)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('DASHBOARD_THREADS', 4)),
+                        help="request threads per worker in production mode")
+    parser.add_argument('--data-dir', type=Path, default=DASHBOARD_DIR,
+                        help="directory holding the data files (default: next to this script)")
+    return parser.parse_args()
+
+def serve_production(args):
+    """Serve the preloaded app with gunicorn workers, or waitress threads where gunicorn is missing"""
+    sys.path.insert(0, str(DASHBOARD_DIR))
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        from waitress import serve
+        from dashboard_advanced import server
+        print(f"gunicorn not available; serving with waitress on {args.threads} threads")
+        serve(server, host=args.host, port=args.port, threads=args.threads)
+        return
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{args.host}:{args.port}")
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            # Import the app (and load the data) in the master so workers share it after fork
+            self.cfg.set('preload_app', True)
+            self.cfg.set('timeout', 120)
+
+        def load(self):
+            from dashboard_advanced import create_server
+            # Finish loading before the workers fork, so they start ready and share the data
+            return create_server()
+
+    print(f"Serving with gunicorn: {args.workers} workers x {args.threads} threads")
+    DashboardApplication().run()
+
 def main():
+    args = parse_args()
     print("🚀 Business Intelligence Dashboard Startup")
     print("=" * 50)
-    
+
     # Check if we're in the right directory
-    dashboard_dir = Path("c:/DASHBOARD DEVELOPMENT")
-    if not dashboard_dir.exists():
-        print("❌ Dashboard directory not found!")
+    if not args.data_dir.is_dir():
+        print(f"❌ Data directory not found: {args.data_dir}")
         return
-    
-    os.chdir(dashboard_dir)
-    
+
+    os.chdir(args.data_dir)
+
     # Generate sample data if it doesn't exist
-    if not Path("sales_data.csv").exists():
+    if not Path("sales_data.csv").exists() and not Path("sales_data").is_dir():
         print("📊 Generating sample business data...")
         try:
-            import subprocess
-            result = subprocess.run([sys.executable, "data_generator.py"], 
+            result = subprocess.run([sys.executable, str(DASHBOARD_DIR / "data_generator.py")],
                                   capture_output=True, text=True)
             if result.returncode == 0:
                 print("✅ Sample data generated successfully!")
@@ -36,14 +89,18 @@ def main():
             print(f"❌ Error: {e}")
     else:
         print("✅ Using existing data files")
-    
+
     print("\n🌐 Starting Interactive Dashboard...")
-    print("📍 Dashboard URL: http://localhost:8050")
+    print(f"📍 Dashboard URL: http://localhost:{args.port}")
     print("⏹️  Press Ctrl+C to stop the dashboard\n")
-    
+
     try:
         # Launch the dashboard
-        subprocess.run([sys.executable, "dashboard_advanced.py"])
+        if args.mode == 'production':
+            serve_production(args)
+        else:
+            subprocess.run([sys.executable, str(DASHBOARD_DIR / "dashboard_advanced.py")],
+                           env={**os.environ, 'DASHBOARD_HOST': args.host, 'DASHBOARD_PORT': str(args.port)})
     except KeyboardInterrupt:
         print("\n🛑 Dashboard stopped by user")
     except Exception as e:
@@ -0,0 +1,531 @@
+"""
+Sales data sources behind the dashboard callbacks
+
+A source answers two questions for a date range: the pre-aggregated cube
+covering it (``cube``) and the raw transactions inside it (``table``), plus a
+``summary`` of the whole dataset for the layout and a ``version`` string that
+changes whenever the underlying data does. ``cubes`` rolls the rows up over
+other columns (the leaderboards'), one cube per file, kept in column stores
+like the sales cube.
+
+``InMemorySales`` wraps one fully loaded SalesTable. ``StreamedSales`` reads
+one CSV in bounded chunks and keeps only its cube. ``PartitionedSales``
+reads a directory of month partitions (sales_data/2023-01.csv, ...), keeps
+every partition's small cube in memory, and loads raw partitions only for the
+months a query touches, holding at most ``max_resident`` of them in an LRU.
+
+Sources backed by files are live: ``refresh`` reads only the rows appended to
+the CSV files (or new partition files) since the last call and folds them into
+the in-memory aggregates. Files are treated as append-only; one that shrinks
+or is replaced is reloaded from scratch. Versions are built from the files'
+read positions, not from the aggregates, so every process that has read the
+same rows reports the same version however it batched them.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from column_store import read_cached_columns
+from data_store import parse_csv, parse_csv_chunks, source_signature
+from sales_table import CUBE_DIMENSIONS, DIMENSIONS, MISSING_LABEL, SalesTable
+
+SALES_DATE_COLUMNS = ['Date']
+SALES_CATEGORICAL_COLUMNS = DIMENSIONS
+MAX_RESIDENT_PARTITIONS = int(os.environ.get('DASHBOARD_MAX_PARTITIONS', 12))
+
+# 'auto' streams a sales CSV in chunks when loading it whole would exceed the
+# memory budget; 'memory' and 'stream' force one path
+LOAD_MODE = os.environ.get('DASHBOARD_LOAD_MODE', 'auto')
+MEMORY_BUDGET_MB = int(os.environ.get('DASHBOARD_MEMORY_BUDGET_MB', 2048))
+PARSE_OVERHEAD = 4
+CHUNK_BUDGET_SHARE = 0.5
+MIN_CHUNK_ROWS = 10_000
+# Bytes before a CsvTail's offset compared on each refresh to detect a replaced file
+ANCHOR_BYTES = 64
+
+
+def read_sales_table(path, signature=None):
+    """Load one sales CSV as a SalesTable memory-mapped from its column store
+
+    With a signature (a CsvTail's), only the rows up to its size are read.
+    """
+    nbytes = None if signature is None else signature['size']
+    build = lambda: SalesTable.from_frame(
+        parse_csv(path, SALES_DATE_COLUMNS, SALES_CATEGORICAL_COLUMNS, nbytes)).to_columns()
+    return SalesTable.from_columns(*read_cached_columns(
+        path, build, {'dimensions': DIMENSIONS, 'missing': MISSING_LABEL}, signature=signature))
+
+
+def read_cached_cube(path, build, signature=None, columns=CUBE_DIMENSIONS):
+    """The cube of a sales file over columns, built by build() once and memory-mapped from its column store"""
+    kind = '.cube' if list(columns) == CUBE_DIMENSIONS else f".{'-'.join(columns).lower()}.cube"
+    return SalesTable.from_columns(*read_cached_columns(
+        path, lambda: build().to_columns(), {'cube_dimensions': list(columns), 'missing': MISSING_LABEL},
+        kind=kind, signature=signature))
+
+
+def read_file_cubes(path, signature, column_sets, tables):
+    """The cubes of one sales file over each of column_sets, memory-mapped from column stores
+
+    Any that are missing are built together, in one pass over tables() (the
+    file's raw rows up to signature).
+    """
+    built = {}
+
+    def build(columns):
+        if not built:
+            cubes = [None] * len(column_sets)
+            for table in tables():
+                for position, cube_columns in enumerate(column_sets):
+                    cells = table.rollup(cube_columns)
+                    cubes[position] = cells if cubes[position] is None else cubes[position].append(cells)
+            built.update((tuple(cube_columns), cube) for cube_columns, cube in zip(column_sets, cubes))
+        return built[tuple(columns)]
+
+    return [read_cached_cube(path, partial(build, columns), signature, columns) for columns in column_sets]
+
+
+def _parse_rows(header, data):
+    frame = parse_csv(io.BytesIO(header + data), SALES_DATE_COLUMNS, SALES_CATEGORICAL_COLUMNS)
+    return SalesTable.from_frame(frame) if len(frame) else None
+
+
+def read_rows(path, start, end):
+    """The sales rows in bytes [start, end) of a CSV as a SalesTable, or None if there are none
+
+    The range must hold whole lines, as between two CsvTail offsets; a start
+    of None reads from the first row.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = f.tell() if start is None else start
+        f.seek(start)
+        data = f.read(max(end - start, 0))
+    return _parse_rows(header, data)
+
+
+def _last_line_end(f, size, block=1 << 16):
+    # Offset just past the last newline in the first size bytes of f, 0 if there is none
+    end = size
+    while end > 0:
+        start = max(end - block, 0)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def position_version(tails):
+    """Data version of sources read up to the tails' positions, the same in every process"""
+    digest = hashlib.sha1()
+    for tail in tails:
+        digest.update(json.dumps([os.path.basename(tail.path), tail.position]).encode())
+    return digest.hexdigest()
+
+
+def summarize(cube):
+    """Dataset-wide figures used by the layout: date bounds, totals and labels"""
+    return {
+        'first_day': cube.first_day,
+        'last_day': cube.last_day,
+        'total_sales': float(cube.sales.sum()),
+        'transactions': cube.transaction_count,
+        'labels': {column: cube.labels(column) for column in cube.codes},
+    }
+
+
+class CsvTail:
+    """Byte offset into an append-only CSV, reading only the complete lines added after it
+
+    Create it before loading the file and load only the rows up to its offset
+    (``read_sales_table(path, tail.signature)``), so rows appended while the
+    file is parsed are read once, by the tail. The offset always ends a line:
+    a line the writer has not finished is left for a later read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.header = f.readline()
+            self.offset = _last_line_end(f, stat.st_size)
+            f.seek(max(self.offset - ANCHOR_BYTES, 0))
+            self._anchor = f.read(self.offset - f.tell())
+        self.inode = stat.st_ino
+        self.signature = {'mtime_ns': stat.st_mtime_ns, 'size': self.offset}
+
+    @property
+    def position(self):
+        """The file and offset read up to, identifying the rows read in any process"""
+        return {'inode': self.inode, 'offset': self.offset,
+                'anchor': hashlib.sha1(self._anchor).hexdigest()}
+
+    @property
+    def rewritten(self):
+        """True if the file was replaced rather than appended to since the last read
+
+        That is, it is another file, is shorter than the offset, or no longer
+        holds the bytes last read just before the offset.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self.inode or stat.st_size < self.offset:
+                    return True
+                f.seek(self.offset - len(self._anchor))
+                return f.read(len(self._anchor)) != self._anchor
+        except FileNotFoundError:
+            return True
+
+    def read(self):
+        """Return the rows appended since the last read as a SalesTable, or None if there are none"""
+        signature = source_signature(self.path)
+        if signature['size'] <= self.offset:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(signature['size'] - self.offset)
+        # A writer may be midway through a line; leave it for the next read
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return None
+        self.offset += end
+        self._anchor = (self._anchor + data[:end])[-ANCHOR_BYTES:]
+        self.signature = {'mtime_ns': signature['mtime_ns'], 'size': self.offset}
+        return _parse_rows(self.header, data[:end])
+
+
+class _RowListeners:
+    """Callbacks told about every refresh, for aggregates kept outside the source"""
+
+    _listeners = ()
+
+    def add_listener(self, listener):
+        """Call listener(table) with the rows each refresh adds, or listener(None) when the data is reloaded"""
+        self._listeners = (*self._listeners, listener)
+
+    def _notify(self, table):
+        for listener in self._listeners:
+            listener(table)
+
+
+class _CubeSales(_RowListeners):
+    """Shared cube, summary, version and refresh logic of the single-file sources"""
+
+    _tail = None
+
+    def _set_cube(self, cube):
+        self._cube = cube
+        self.summary = summarize(cube)
+        # Without a file, only the content identifies the data
+        self._version = cube.fingerprint() if self._tail is None else position_version([self._tail])
+
+    def version(self):
+        return self._version
+
+    def refresh(self):
+        """Fold rows appended to the source CSV into the cube; returns the number of new rows"""
+        if self._tail is None:
+            return 0
+        with self._lock:
+            if self._tail.rewritten:
+                self._reload()
+                new, added = None, self.summary['transactions']
+            else:
+                new = self._tail.read()
+                if new is None:
+                    return 0
+                self._add_rows(new)
+                self._set_cube(self._cube.append(new.rollup(CUBE_DIMENSIONS)))
+                added = len(new)
+        # Outside the lock: a listener rebuilding from iter_tables takes it again
+        self._notify(new)
+        return added
+
+    def cube(self, start_day=None, end_day=None):
+        return self._cube
+
+    def snapshot(self):
+        """(cube, {file: byte offset its rows are read up to}, version) of one state of the source"""
+        with self._lock:
+            offsets = {} if self._tail is None else {self.path: self._tail.offset}
+            return self._cube, offsets, self._version
+
+
+class InMemorySales(_CubeSales):
+    """A fully loaded sales table and its cube"""
+
+    def __init__(self, table, cube=None, path=None, tail=None):
+        self.path = path
+        self._tail = tail
+        self._lock = threading.Lock()
+        self._load(table, cube)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a sales CSV and follow the rows appended to it"""
+        tail = CsvTail(path)
+        table = read_sales_table(path, tail.signature)
+        return cls(table, read_cached_cube(path, lambda: table.rollup(CUBE_DIMENSIONS), tail.signature),
+                   path, tail)
+
+    def _load(self, table, cube=None):
+        self._table = table
+        self._pending = []
+        self._set_cube(table.rollup(CUBE_DIMENSIONS) if cube is None else cube)
+
+    def _reload(self):
+        self._tail = CsvTail(self.path)
+        signature = self._tail.signature
+        table = read_sales_table(self.path, signature)
+        self._load(table, read_cached_cube(self.path, lambda: table.rollup(CUBE_DIMENSIONS), signature))
+
+    def _add_rows(self, table):
+        # Only the cube is updated now; raw rows are merged on the next table() call
+        self._pending.append(table)
+
+    def iter_tables(self, start_day=None, end_day=None):
+        yield self.table(start_day, end_day)
+
+    def cubes(self, column_sets):
+        """For each of column_sets, the cubes over it of the source's files (here, one)"""
+        if self.path is None:
+            table = self.table()
+            return [[table.rollup(columns)] for columns in column_sets]
+        cubes = read_file_cubes(self.path, self._tail.signature, column_sets, lambda: [self.table()])
+        return [[cube] for cube in cubes]
+
+    def table(self, start_day=None, end_day=None):
+        with self._lock:
+            if self._pending:
+                new = SalesTable.concat(self._pending).sorted_by_day()
+                self._table, self._pending = self._table.append(new), []
+            table = self._table
+        return table.window(start_day, end_day)
+
+
+class StreamedSales(_CubeSales):
+    """A sales CSV read in bounded chunks, keeping only its cube in memory
+
+    Each chunk is rolled up into the cube and discarded, so the file may be
+    larger than memory. The cube is kept in a column store like a partition's cube, and
+    raw rows are streamed from the file again whenever a table is requested.
+    """
+
+    def __init__(self, path, chunk_rows):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.chunks_read = 0
+        self._lock = threading.Lock()
+        self._reload()
+
+    def _reload(self):
+        self._tail = CsvTail(self.path)
+        self._set_cube(read_cached_cube(self.path, self._stream_cube, self._tail.signature))
+
+    def _chunks(self):
+        # Up to the tail's offset, so raw rows match the cube
+        for frame in parse_csv_chunks(self.path, self.chunk_rows, SALES_DATE_COLUMNS,
+                                      SALES_CATEGORICAL_COLUMNS, self._tail.offset):
+            self.chunks_read += 1
+            yield SalesTable.from_frame(frame)
+
+    def _stream_cube(self):
+        cube = None
+        for chunk in self._chunks():
+            cells = chunk.rollup(CUBE_DIMENSIONS)
+            cube = cells if cube is None else cube.append(cells)
+        if cube is None:
+            raise FileNotFoundError(f"No sales rows found in {self.path}")
+        return cube
+
+    def _add_rows(self, table):
+        # Appended rows are read back from the file with the rest
+        pass
+
+    def cubes(self, column_sets):
+        """For each of column_sets, the cubes over it of the source's files (here, one)"""
+        return [[cube] for cube in read_file_cubes(self.path, self._tail.signature, column_sets, self._chunks)]
+
+    def iter_tables(self, start_day=None, end_day=None):
+        """Raw rows in the date range, one chunk of the file at a time"""
+        for chunk in self._chunks():
+            table = chunk.window(start_day, end_day)
+            if len(table):
+                yield table
+
+    def table(self, start_day=None, end_day=None):
+        tables = list(self.iter_tables(start_day, end_day))
+        if not tables:
+            return next(self._chunks()).take(slice(0, 0))
+        return SalesTable.concat(tables).sorted_by_day()
+
+
+def estimate_load(path, sample_bytes=1 << 20):
+    """Estimate (rows, bytes per parsed row) of a sales CSV from its first sample_bytes"""
+    with open(path, 'rb') as f:
+        head = f.read(sample_bytes)
+    head = head[:head.rfind(b'\n') + 1]
+    frame = parse_csv(io.BytesIO(head), SALES_DATE_COLUMNS, SALES_CATEGORICAL_COLUMNS)
+    if len(frame) == 0:
+        return 0, 0
+    rows = len(frame) * os.path.getsize(path) / len(head)
+    return int(rows), frame.memory_usage(deep=True).sum() / len(frame)
+
+
+def open_sales_csv(path, mode=LOAD_MODE, budget_mb=MEMORY_BUDGET_MB):
+    """Load a sales CSV whole or, if it would not fit the memory budget, streamed in chunks"""
+    rows, row_bytes = estimate_load(path)
+    # Parsing holds the text buffers and the typed frame at once
+    needed_mb = rows * row_bytes * PARSE_OVERHEAD / 2**20
+    if mode == 'memory' or (mode == 'auto' and needed_mb <= budget_mb):
+        return InMemorySales.from_csv(path)
+
+    chunk_rows = max(MIN_CHUNK_ROWS, int(budget_mb * 2**20 * CHUNK_BUDGET_SHARE /
+                                         max(row_bytes * PARSE_OVERHEAD, 1)))
+    print(f"Streaming {path} (~{rows:,} rows, ~{needed_mb:,.0f} MB to load whole) "
+          f"in chunks of {chunk_rows:,} rows to stay within {budget_mb:,} MB")
+    return StreamedSales(path, chunk_rows)
+
+
+class PartitionedSales(_RowListeners):
+    """Month-partitioned sales files, pruned by date range and loaded on demand"""
+
+    def __init__(self, directory, max_resident=MAX_RESIDENT_PARTITIONS):
+        self.directory = directory
+        self.max_resident = max_resident
+        self.paths = sorted(glob.glob(os.path.join(directory, '*.csv')))
+        if not self.paths:
+            raise FileNotFoundError(f"No partitions found in {directory}")
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+        # Partition cubes are a few thousand cells each; keep all of them resident
+        # and keep them in column stores so a restart does not re-read the raw partitions
+        self._tails = {}
+        self._cubes = OrderedDict((path, self._read_cube(path)) for path in self.paths)
+        if not any(len(cube) for cube in self._cubes.values()):
+            raise FileNotFoundError(f"No sales rows found in {directory}")
+        self._update_summary()
+
+    def _read_cube(self, path):
+        self._tails[path] = CsvTail(path)
+        return read_cached_cube(path, lambda: self._raw(path).rollup(CUBE_DIMENSIONS), self._tails[path].signature)
+
+    def _raw(self, path):
+        """Raw partition table, loaded through the LRU of resident partitions"""
+        with self._lock:
+            table = self._resident.get(path)
+            if table is not None:
+                self._resident.move_to_end(path)
+                return table
+            # Up to the tail's offset: later rows are appended to the resident table by refresh
+            table = read_sales_table(path, self._tails[path].signature)
+            self.loads += 1
+            self._resident[path] = table
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+                self.evictions += 1
+            return table
+
+    def _update_summary(self):
+        self.summary = summarize(SalesTable.concat(cube for cube in self._cubes.values() if len(cube)))
+        self._version = position_version(self._tails[path] for path in self.paths)
+
+    def version(self):
+        return self._version
+
+    def snapshot(self):
+        """(cube, {file: byte offset its rows are read up to}, version) of one state of the source"""
+        with self._refresh_lock:
+            return self.cube(), {path: self._tails[path].offset for path in self.paths}, self._version
+
+    def refresh(self):
+        """Pick up new partition files and rows appended to existing ones; returns the number of new rows"""
+        with self._refresh_lock:
+            cubes = OrderedDict(self._cubes)
+            added, changed = 0, False
+            # Rows for the listeners: new partitions and appended rows, or None if one was rewritten
+            new_tables = []
+            for path in sorted(glob.glob(os.path.join(self.directory, '*.csv'))):
+                tail = self._tails.get(path)
+                if tail is None or tail.rewritten:
+                    with self._lock:
+                        self._resident.pop(path, None)
+                    if new_tables is not None:
+                        new_tables = None if tail is not None else new_tables + [path]
+                    cubes[path] = self._read_cube(path)
+                    added += cubes[path].transaction_count
+                    changed = True
+                    continue
+                # Under the LRU lock, so a raw load sees the rows either in the file
+                # prefix it reads or appended to its table, never both
+                with self._lock:
+                    new = tail.read()
+                    if new is not None and path in self._resident:
+                        self._resident[path] = self._resident[path].append(new)
+                if new is None:
+                    continue
+                cubes[path] = cubes[path].append(new.rollup(CUBE_DIMENSIONS))
+                if new_tables is not None:
+                    new_tables.append(new)
+                added += len(new)
+                changed = True
+            if changed:
+                self._cubes = OrderedDict(sorted(cubes.items()))
+                self.paths = list(self._cubes)
+                self._update_summary()
+        if new_tables is None:
+            self._notify(None)
+        else:
+            for table in new_tables:
+                self._notify(self._raw(table) if isinstance(table, str) else table)
+        return added
+
+    def prune(self, start_day=None, end_day=None):
+        """Partitions whose date range overlaps [start_day, end_day]"""
+        return [path for path, cube in self._cubes.items()
+                if len(cube) and
+                   (start_day is None or cube.last_day >= start_day) and
+                   (end_day is None or cube.first_day <= end_day)]
+
+    def cube(self, start_day=None, end_day=None):
+        cubes = [self._cubes[path] for path in self.prune(start_day, end_day)]
+        if not cubes:
+            return next(iter(self._cubes.values())).take(slice(0, 0))
+        return SalesTable.concat(cubes)
+
+    def cubes(self, column_sets):
+        """For each of column_sets, the cubes over it of every partition
+
+        They are kept in column stores like the partitions' sales cubes, so a
+        warm start loads no raw partition.
+        """
+        per_path = [read_file_cubes(path, self._tails[path].signature, column_sets, partial(self._raw_tables, path))
+                    for path in self.paths]
+        return [list(cubes) for cubes in zip(*per_path)]
+
+    def _raw_tables(self, path):
+        return [self._raw(path)]
+
+    def iter_tables(self, start_day=None, end_day=None):
+        """Raw rows in the date range, one partition at a time"""
+        for path in self.prune(start_day, end_day):
+            yield self._raw(path).window(start_day, end_day)
+
+    def table(self, start_day=None, end_day=None):
+        tables = [table for table in self.iter_tables(start_day, end_day) if len(table)]
+        if not tables:
+            return self._raw(self.paths[0]).take(slice(0, 0))
+        return SalesTable.concat(tables)
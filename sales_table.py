@@ -0,0 +1,372 @@
+"""
+Compact column-oriented representation of the sales data
+
+Dimension columns are dictionary encoded into small integer codes, dates are
+stored as int32 day ordinals (days since 1970-01-01) and sales as float64, so
+filters become integer comparisons and group-bys become bincounts over codes.
+
+The same layout holds pre-aggregated cubes: each row of a cube is one
+(day, dimension codes) cell whose ``sales``, ``count`` and ``sumsq`` columns
+carry the sum, number and sum of squares of the transactions it covers.
+
+Rows are kept sorted by day, with a day-offset index, so a date range is a
+contiguous slice (a zero-copy view) found without scanning the rows.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['Region', 'Product_Category', 'Customer_Segment', 'Sales_Rep', 'Channel']
+CUBE_DIMENSIONS = ['Region', 'Product_Category', 'Customer_Segment']
+
+# Largest dense key space rolled up with bincount before falling back to np.unique
+DENSE_ROLLUP_LIMIT = 5_000_000
+# Label of blank dimension values, which would otherwise get code -1
+MISSING_LABEL = 'Unknown'
+
+
+def to_day(value):
+    """Convert a date-like value (string, Timestamp, datetime) to a day ordinal
+
+    None and empty strings (a cleared date picker) stay None, meaning unbounded.
+    """
+    if value is None or value == '':
+        return None
+    return int(np.datetime64(pd.Timestamp(value), 'D').astype(np.int64))
+
+
+def from_days(days):
+    """Convert an array of day ordinals back to datetime64 values"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def _code_dtype(size):
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def encode_column(values):
+    """Dictionary-encode a column, returning (codes, sorted dictionary of labels)
+
+    Blank values are encoded as MISSING_LABEL: a code of -1 would index the
+    end of the dictionary and shift composite keys into a neighbouring cell.
+    """
+    categorical = pd.Series(values).astype('category')
+    if categorical.isna().any():
+        if MISSING_LABEL not in categorical.cat.categories:
+            categorical = categorical.cat.add_categories([MISSING_LABEL])
+        categorical = categorical.fillna(MISSING_LABEL)
+    categories = categorical.cat.categories
+    if not categories.is_monotonic_increasing:
+        categorical = categorical.cat.reorder_categories(categories.sort_values())
+    dictionary = np.asarray(categorical.cat.categories, dtype=object)
+    codes = categorical.cat.codes.to_numpy().astype(_code_dtype(len(dictionary)))
+    return codes, dictionary
+
+
+class SalesTable:
+    """Dictionary-encoded sales table with int32 day ordinals, sorted by day
+
+    ``count`` and ``sumsq`` are None for raw transactions (one row per sale) and
+    set for cubes built by ``rollup``.
+    """
+
+    def __init__(self, day, sales, codes, dictionaries, count=None, sumsq=None):
+        self.day = day
+        self.sales = sales
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.count = count
+        self.sumsq = sumsq
+        self._day_offsets = None
+
+    @classmethod
+    def from_frame(cls, frame):
+        day = frame['Date'].to_numpy().astype('datetime64[D]').astype(np.int32)
+        sales = frame['Sales'].to_numpy(dtype=np.float64)
+        codes, dictionaries = {}, {}
+        for column in DIMENSIONS:
+            if column in frame:
+                codes[column], dictionaries[column] = encode_column(frame[column])
+        count = sumsq = None
+        if 'Count' in frame:
+            # A cube written out with to_frame()
+            count = frame['Count'].to_numpy(dtype=np.int64)
+            sumsq = frame['Sum_Squares'].to_numpy(dtype=np.float64)
+        return cls(day, sales, codes, dictionaries, count, sumsq).sorted_by_day()
+
+    @classmethod
+    def from_columns(cls, arrays, dictionaries):
+        """Wrap column store arrays (see to_columns) without copying them"""
+        codes = {column: arrays[column] for column in DIMENSIONS if column in arrays}
+        return cls(arrays['Date'], arrays['Sales'], codes,
+                   {column: np.asarray(dictionaries[column], dtype=object) for column in codes},
+                   arrays.get('Count'), arrays.get('Sum_Squares'))
+
+    def to_columns(self):
+        """Return (arrays, dictionaries) for a column store, in day order"""
+        arrays = {'Date': self.day, 'Sales': self.sales, **self.codes}
+        if self.is_cube:
+            arrays['Count'] = self.count
+            arrays['Sum_Squares'] = self.sumsq
+        return arrays, self.dictionaries
+
+    @classmethod
+    def concat(cls, tables):
+        """Concatenate tables holding consecutive date ranges, merging their dictionaries
+
+        The tables must share the same columns and be given in day order.
+        """
+        tables = list(tables)
+        first = tables[0]
+        if len(tables) == 1:
+            return first
+        codes, dictionaries = {}, {}
+        for column in first.codes:
+            merged = np.unique(np.concatenate([t.dictionaries[column] for t in tables]))
+            dictionary = np.asarray(merged, dtype=object)
+            dtype = _code_dtype(len(dictionary))
+            # Remap each table's codes into the merged dictionary
+            codes[column] = np.concatenate([
+                np.searchsorted(dictionary, t.dictionaries[column]).astype(dtype)[t.codes[column]]
+                for t in tables])
+            dictionaries[column] = dictionary
+        return cls(np.concatenate([t.day for t in tables]),
+                   np.concatenate([t.sales for t in tables]),
+                   codes, dictionaries,
+                   None if first.count is None else np.concatenate([t.count for t in tables]),
+                   None if first.sumsq is None else np.concatenate([t.sumsq for t in tables]))
+
+    def sorted_by_day(self):
+        """Return the table with rows in day order (itself if already sorted)"""
+        if len(self) and np.any(self.day[1:] < self.day[:-1]):
+            return self.take(np.argsort(self.day, kind='stable'))
+        return self
+
+    def append(self, other):
+        """Return a new table holding the rows of this table and then of ``other``
+
+        Rows of ``other`` may reach back into this table's date range; only the
+        overlapping days are re-sorted and, for cubes, re-aggregated so that
+        every (day, dimension codes) cell still appears once.
+        """
+        if len(other) == 0:
+            return self
+        if len(self) == 0:
+            return other
+        if other.first_day > self.last_day or (other.first_day == self.last_day and not self.is_cube):
+            return SalesTable.concat([self, other])
+        overlap = SalesTable.concat([self.window(other.first_day, None), other]).sorted_by_day()
+        if self.is_cube:
+            overlap = overlap.rollup(list(self.codes))
+        return SalesTable.concat([self.window(None, other.first_day - 1), overlap])
+
+    def to_frame(self):
+        frame = pd.DataFrame({'Date': from_days(self.day), 'Sales': self.sales})
+        for column, codes in self.codes.items():
+            frame[column] = pd.Categorical.from_codes(codes, self.dictionaries[column])
+        if self.count is not None:
+            frame['Count'] = self.count
+            frame['Sum_Squares'] = self.sumsq
+        return frame
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def is_cube(self):
+        return self.count is not None
+
+    @property
+    def nbytes(self):
+        total = (self.day.nbytes + self.sales.nbytes +
+                 sum(codes.nbytes for codes in self.codes.values()))
+        if self.is_cube:
+            total += self.count.nbytes + self.sumsq.nbytes
+        return total
+
+    @property
+    def transaction_count(self):
+        return int(self.count.sum()) if self.is_cube else len(self)
+
+    def fingerprint(self):
+        """Content hash identifying this version of the data"""
+        digest = hashlib.sha1()
+        for array in [self.day, self.sales, self.count, self.sumsq] + list(self.codes.values()):
+            if array is not None:
+                digest.update(np.ascontiguousarray(array).tobytes())
+        for column, dictionary in self.dictionaries.items():
+            digest.update(repr((column, list(dictionary))).encode())
+        return digest.hexdigest()
+
+    def labels(self, column):
+        return list(self.dictionaries[column])
+
+    def code(self, column, value):
+        """Return the integer code for a label, or -1 if the label is unknown"""
+        dictionary = self.dictionaries[column]
+        try:
+            position = np.searchsorted(dictionary, value)
+        except TypeError:
+            return -1
+        if position < len(dictionary) and dictionary[position] == value:
+            return int(position)
+        return -1
+
+    @property
+    def first_day(self):
+        return int(self.day[0]) if len(self) else None
+
+    @property
+    def last_day(self):
+        return int(self.day[-1]) if len(self) else None
+
+    @property
+    def day_offsets(self):
+        """Day-offset index: rows of day ``first_day + k`` are ``offsets[k]:offsets[k + 1]``"""
+        if self._day_offsets is None:
+            if len(self) == 0:
+                self._day_offsets = np.zeros(1, dtype=np.int64)
+            else:
+                days = np.arange(self.first_day, self.last_day + 2, dtype=np.int64)
+                self._day_offsets = np.searchsorted(self.day, days)
+        return self._day_offsets
+
+    def day_slice(self, start_day=None, end_day=None):
+        """Return the row slice holding days in [start_day, end_day]; None bounds are open"""
+        offsets = self.day_offsets
+        if len(self) == 0:
+            return slice(0, 0)
+        last = len(offsets) - 1
+        lo = 0 if start_day is None else min(max(start_day - self.first_day, 0), last)
+        hi = last if end_day is None else min(max(end_day + 1 - self.first_day, 0), last)
+        return slice(int(offsets[lo]), int(max(offsets[hi], offsets[lo])))
+
+    def window(self, start_day=None, end_day=None):
+        """Zero-copy view of the rows in a date range"""
+        return self.take(self.day_slice(start_day, end_day))
+
+    def take(self, index):
+        return SalesTable(self.day[index], self.sales[index],
+                          {column: codes[index] for column, codes in self.codes.items()},
+                          self.dictionaries,
+                          None if self.count is None else self.count[index],
+                          None if self.sumsq is None else self.sumsq[index])
+
+    def _counts(self, keys, minlength=0):
+        if self.is_cube:
+            return np.bincount(keys, weights=self.count, minlength=minlength).round().astype(np.int64)
+        return np.bincount(keys, minlength=minlength)
+
+    def _composite_keys(self, columns):
+        """Mixed-radix composite key over (day offset, code, code, ...), with the radix sizes"""
+        sizes = [self.last_day - self.first_day + 1] + [len(self.dictionaries[c]) for c in columns]
+        keys = self.day.astype(np.int64) - self.first_day
+        for column, size in zip(columns, sizes[1:]):
+            keys = keys * size + self.codes[column]
+        return sizes, keys
+
+    def rollup(self, columns=CUBE_DIMENSIONS):
+        """Aggregate into a cube with one row per (day, *columns) cell that has sales
+
+        Cells come out ordered by day, then by the codes of ``columns`` in order.
+        """
+        if len(self) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return SalesTable(self.day[:0], self.sales[:0],
+                              {column: self.codes[column][:0] for column in columns},
+                              {column: self.dictionaries[column] for column in columns},
+                              empty, self.sales[:0])
+
+        first = self.first_day
+        sizes, keys = self._composite_keys(columns)
+        sumsq = self.sumsq if self.is_cube else self.sales * self.sales
+        key_space = int(np.prod(sizes))
+        if key_space <= DENSE_ROLLUP_LIMIT:
+            counts = self._counts(keys, key_space)
+            cells = np.flatnonzero(counts)
+            counts = counts[cells]
+            sums = np.bincount(keys, weights=self.sales, minlength=key_space)[cells]
+            squares = np.bincount(keys, weights=sumsq, minlength=key_space)[cells]
+        else:
+            cells, inverse = np.unique(keys, return_inverse=True)
+            counts = self._counts(inverse)
+            sums = np.bincount(inverse, weights=self.sales)
+            squares = np.bincount(inverse, weights=sumsq)
+
+        # Unpack the composite key back into its components
+        codes = {}
+        remainder = cells
+        for column, size in reversed(list(zip(columns, sizes[1:]))):
+            codes[column] = (remainder % size).astype(self.codes[column].dtype)
+            remainder = remainder // size
+        day = (remainder + first).astype(np.int32)
+        codes = {column: codes[column] for column in columns}
+        return SalesTable(day, sums, codes,
+                          {column: self.dictionaries[column] for column in columns},
+                          counts, squares)
+
+    def select(self, start_day=None, end_day=None, equals=None):
+        """Return the rows inside [start_day, end_day] matching every column == label filter
+
+        The date range is resolved through the day-offset index first, so the
+        label predicates only ever look at rows inside the window.
+        """
+        selected = self.window(start_day, end_day)
+        if not equals:
+            return selected
+        mask = np.ones(len(selected), dtype=bool)
+        for column, value in equals.items():
+            mask &= selected.codes[column] == self.code(column, value)
+        return selected.take(mask)
+
+    def aggregate(self, columns=CUBE_DIMENSIONS):
+        """Compute the per-day and per-column roll-ups in a single pass over the rows
+
+        One bincount over the composite (day, *columns) key yields a dense
+        sum/count array; every roll-up is then a reduction over its other axes,
+        which costs days x dimension values regardless of the row count.
+
+        Returns a dict mapping 'Date' and each column to a frame with the group
+        label, 'Sales' (sum), 'Count' and 'Mean', holding only groups with rows.
+        """
+        names = ['Date'] + list(columns)
+        if len(self) == 0:
+            return {name: rollup_frame(name, [], np.empty(0), np.empty(0, dtype=np.int64))
+                    for name in names}
+
+        sizes, keys = self._composite_keys(columns)
+        key_space = int(np.prod(sizes))
+        if key_space <= DENSE_ROLLUP_LIMIT:
+            sums = np.bincount(keys, weights=self.sales, minlength=key_space).reshape(sizes)
+            counts = self._counts(keys, key_space).reshape(sizes)
+            axes = range(len(sizes))
+            marginals = [(sums.sum(axis=tuple(a for a in axes if a != axis)),
+                          counts.sum(axis=tuple(a for a in axes if a != axis)))
+                         for axis in axes]
+        else:
+            # Key space too large to materialize densely: one bincount per roll-up
+            group_keys = [self.day - self.first_day] + [self.codes[c] for c in columns]
+            marginals = [(np.bincount(k, weights=self.sales, minlength=size),
+                          self._counts(k, size))
+                         for k, size in zip(group_keys, sizes)]
+
+        labels = [from_days(np.arange(self.first_day, self.last_day + 1))]
+        labels += [self.dictionaries[column] for column in columns]
+        return {name: rollup_frame(name, label, group_sums, group_counts)
+                for name, label, (group_sums, group_counts) in zip(names, labels, marginals)}
+
+
+def rollup_frame(name, labels, sums, counts):
+    """Frame of one roll-up: the group label, 'Sales', 'Count' and 'Mean' of groups with rows"""
+    present = counts > 0
+    return pd.DataFrame({
+        name: np.asarray(labels)[present] if len(labels) else labels,
+        'Sales': sums[present],
+        'Count': counts[present],
+        'Mean': sums[present] / counts[present],
+    })
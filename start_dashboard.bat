@@ -2,8 +2,8 @@
 echo Starting Business Dashboard Application...
 echo.
 
-REM Change to the dashboard directory
-cd /d "c:\DASHBOARD DEVELOPMENT"
+REM Change to the directory holding this script
+cd /d "%~dp0"
 
 REM Generate sample data if it doesn't exist
 if not exist "sales_data.csv" (
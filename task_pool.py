@@ -0,0 +1,44 @@
+"""
+Bounded thread pool for building independent figures concurrently
+
+``run_all(tasks, size)`` runs zero-argument callables and returns their
+results in order: on a pool of DASHBOARD_FIGURE_WORKERS threads shared by
+all requests, or one after another when there is one worker, one task, or
+``size`` (the number of data points the tasks draw) is below
+DASHBOARD_PARALLEL_MIN_POINTS, where handing tasks to the pool costs more
+than it saves. Threads rather than processes, so the tasks can return
+figures and patches without pickling them; the speed-up comes from the
+numpy, pandas and JSON encoding work that runs outside the GIL. Spans the
+tasks time on the pool count towards the request that submitted them.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+FIGURE_WORKERS = int(os.environ.get('DASHBOARD_FIGURE_WORKERS', min(4, os.cpu_count() or 1)))
+PARALLEL_MIN_POINTS = int(os.environ.get('DASHBOARD_PARALLEL_MIN_POINTS', 5000))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool():
+    global _pool, _pool_pid
+    # Threads do not survive a fork, so each worker process gets its own pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix='dashboard-figures')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def run_all(tasks, size=None):
+    """Results of the tasks in order, run concurrently when that is worth it"""
+    if FIGURE_WORKERS <= 1 or len(tasks) < 2 or (size is not None and size < PARALLEL_MIN_POINTS):
+        return [task() for task in tasks]
+    futures = [_shared_pool().submit(metrics.in_request(task)) for task in tasks]
+    return [future.result() for future in futures]
@@ -0,0 +1,55 @@
+"""Tests for the trend chart's point budget"""
+
+import numpy as np
+import pytest
+
+from downsample import bucket_days, lttb, resample_trend
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), rng.random(n) * 100
+
+
+@pytest.mark.parametrize('n, threshold', [(10, 3), (100, 7), (1000, 100), (1001, 1000), (5000, 999)])
+def test_lttb_keeps_threshold_points_with_both_endpoints(n, threshold):
+    x, y = series(n)
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+@pytest.mark.parametrize('threshold', [0, 1, 2, 50, 51])
+def test_lttb_keeps_every_point_below_three_or_above_the_length(threshold):
+    x, y = series(50)
+    assert list(lttb(x, y, threshold)) == list(range(50))
+
+
+def test_lttb_keeps_a_spike():
+    x, y = np.arange(500.0), np.ones(500)
+    y[321] = 1000
+    assert 321 in lttb(x, y, 20)
+
+
+def test_resample_trend_caps_points_and_keeps_range():
+    days = np.arange(19000, 19000 + 3000)
+    sales = np.random.default_rng(1).random(len(days))
+    out_days, out_sales, grain = resample_trend(days, sales, grain='day', max_points=250)
+    assert grain == 'day' and len(out_days) == len(out_sales) == 250
+    assert out_days[0] == days[0] and out_days[-1] == days[-1]
+
+
+def test_resample_trend_sums_into_buckets():
+    days = np.arange(19000, 19400)
+    sales = np.ones(len(days))
+    out_days, out_sales, grain = resample_trend(days, sales, grain='month', max_points=1000)
+    assert grain == 'month'
+    assert list(out_days) == sorted(set(bucket_days(days, 'month')))
+    assert out_sales.sum() == len(days)
+
+
+def test_resample_trend_auto_grain_fits_the_target():
+    days = np.arange(0, 3650)
+    out_days, _, grain = resample_trend(days, np.ones(len(days)), target_points=200, max_points=1000)
+    assert grain == 'month' and len(out_days) <= 200
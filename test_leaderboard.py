@@ -0,0 +1,107 @@
+"""Tests for the leaderboards: incremental totals must rank as a full recompute does"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from leaderboard import MAX_APPENDED_CUBES, RunningTopK, build_leaderboards
+from sales_source import InMemorySales, PartitionedSales
+
+HEADER = "Date,Sales,Region,Product_Category,Customer_Segment,Sales_Rep,Channel\n"
+REGIONS = ['North', 'South', 'East', 'West']
+CATEGORIES = ['Books', 'Clothing', 'Electronics']
+CHANNELS = ['Online', 'Retail', 'Partner']
+# 2024-01-10 and 2024-02-20 as day ordinals
+SELECTIONS = [(None, None, {}), (19732, 19773, {}), (None, None, {'Region': 'North'}),
+              (19732, None, {'Region': 'South', 'Product_Category': 'Books'}),
+              (None, None, {'Region': 'Atlantis'})]
+
+
+def sales_lines(n, month=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"2024-{month:02d}-{rng.integers(1, 29):02d},{rng.random() * 1000!r},"
+            f"{REGIONS[rng.integers(4)]},{CATEGORIES[rng.integers(3)]},Premium,"
+            f"Rep_{rng.integers(40)},{CHANNELS[rng.integers(3)]}\n" for _ in range(n)]
+
+
+def write(path, text, mode='w'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def expected_top(frame, column, start_day=None, end_day=None, equals=None, k=10):
+    days = pd.to_datetime(frame['Date']).values.astype('datetime64[D]').astype(np.int64)
+    mask = np.ones(len(frame), dtype=bool)
+    if start_day is not None:
+        mask &= days >= start_day
+    if end_day is not None:
+        mask &= days <= end_day
+    for dimension, value in (equals or {}).items():
+        mask &= (frame[dimension] == value).values
+    totals = frame[mask].groupby(column)['Sales'].agg(['sum', 'count'])
+    totals = totals.sort_values('sum', ascending=False).head(k)
+    return [(label, round(row['sum']), int(row['count'])) for label, row in totals.iterrows()]
+
+
+def assert_boards_match(boards, paths):
+    frame = pd.concat([pd.read_csv(path) for path in paths])
+    for column, board in boards.items():
+        for start_day, end_day, equals in SELECTIONS:
+            top = [(record[column], record['Total_Sales'], record['Transactions'])
+                   for record in board.top(start_day, end_day, equals)]
+            assert top == expected_top(frame, column, start_day, end_day, equals, board.k), \
+                (column, start_day, end_day, equals)
+
+
+def test_running_top_k_matches_a_full_recompute():
+    rng = np.random.default_rng(1)
+    running, totals = RunningTopK(10), {}
+    for batch in range(300):
+        labels = np.unique(rng.integers(0, 5000, 50)).astype(str).astype(object)
+        # Every 25th batch is refunds, which can push leaders out
+        sales = rng.random(len(labels)) * 100 - (200 if batch % 25 == 0 else 0)
+        running.add(running.ids(labels), sales, np.ones(len(labels), dtype=np.int64))
+        for label, amount in zip(labels, sales):
+            totals[label] = totals.get(label, 0) + amount
+        expected = sorted(totals, key=lambda label: -totals[label])[:10]
+        assert list(running.labels[running.leaders]) == expected, batch
+    assert dict(zip(running.labels, running.sales)) == pytest.approx(totals)
+
+
+def test_leaderboards_follow_appends(tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    write(path, HEADER + ''.join(sales_lines(300)))
+    source = InMemorySales.from_csv(path)
+    boards = build_leaderboards(source)
+    assert_boards_match(boards, [path])
+
+    # Enough batches to merge the appended cubes, one with a label never seen before
+    for batch in range(MAX_APPENDED_CUBES + 5):
+        write(path, ''.join(sales_lines(7, month=2, seed=batch + 1)), 'a')
+        source.refresh()
+    write(path, "2024-02-21,5000.0,Atlantis,Books,Premium,Rep_New,Online\n", 'a')
+    source.refresh()
+    assert_boards_match(boards, [path])
+    assert len(boards['Sales_Rep']._cubes) <= MAX_APPENDED_CUBES + 1
+
+    write(path, HEADER + ''.join(sales_lines(100, seed=99)))
+    source.refresh()
+    assert_boards_match(boards, [path])
+
+
+def test_leaderboards_follow_partitions(tmp_path):
+    directory = tmp_path / 'sales_data'
+    directory.mkdir()
+    january, february = str(directory / '2024-01.csv'), str(directory / '2024-02.csv')
+    write(january, HEADER + ''.join(sales_lines(200, month=1)))
+    source = PartitionedSales(str(directory))
+    boards = build_leaderboards(source)
+    # A warm start reads the boards' cubes from their column stores, without the raw partitions
+    warm = PartitionedSales(str(directory))
+    assert_boards_match(build_leaderboards(warm), [january])
+    assert warm.loads == 0
+
+    write(january, ''.join(sales_lines(20, month=1, seed=5)), 'a')
+    write(february, HEADER + ''.join(sales_lines(100, month=2)))
+    source.refresh()
+    assert_boards_match(boards, [january, february])
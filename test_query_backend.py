@@ -0,0 +1,118 @@
+"""Tests for the SQL query backends: every roll-up must match the cube backend's, also after appends"""
+
+import numpy as np
+import pytest
+
+from query_backend import CubeBackend, DuckDBBackend, SQLiteBackend
+from sales_source import InMemorySales, PartitionedSales
+from sales_table import MISSING_LABEL
+
+HEADER = "Date,Sales,Region,Product_Category,Customer_Segment,Sales_Rep,Channel\n"
+REGIONS = ['North', 'South', 'East', 'West']
+CATEGORIES = ['Books', 'Clothing', 'Electronics']
+SEGMENTS = ['Premium', 'Standard', 'Budget']
+# 2024-01-10 and 2024-02-20 as day ordinals
+SELECTIONS = [(None, None, {}), (19732, 19773, {}), (None, None, {'Region': 'North'}),
+              (19732, None, {'Region': 'South', 'Product_Category': 'Books'}),
+              (None, None, {'Region': 'Atlantis'}), (None, None, {'Customer_Segment': MISSING_LABEL})]
+
+
+def sales_lines(n, month=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f"2024-{month:02d}-{rng.integers(1, 29):02d},{rng.random() * 1000!r},"
+            f"{REGIONS[rng.integers(4)]},{CATEGORIES[rng.integers(3)]},{SEGMENTS[rng.integers(3)]},"
+            f"Rep_{rng.integers(20)},Online\n" for _ in range(n)]
+
+
+def write(path, text, mode='w'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def normalized(frames):
+    return {name: {str(label): (round(sales, 6), count) for label, sales, count
+                   in zip(frame.iloc[:, 0], frame['Sales'], frame['Count'])}
+            for name, frame in frames.items()}
+
+
+def assert_matches_cube(backend):
+    backend.sync()
+    reference = CubeBackend(backend.sales_source)
+    for start_day, end_day, equals in SELECTIONS:
+        assert normalized(backend.rollups(start_day, end_day, equals)) == \
+            normalized(reference.rollups(start_day, end_day, equals)), (start_day, end_day, equals)
+
+
+def stored_version(backend):
+    return backend._stored(backend._connection())[0]
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def open_backend(request, tmp_path):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+        return lambda source: DuckDBBackend(source, str(tmp_path / 'sales.duckdb'))
+    return lambda source: SQLiteBackend(source, str(tmp_path / 'sales.sqlite'))
+
+
+def test_backend_matches_cube_after_appends(tmp_path, open_backend):
+    path = str(tmp_path / 'sales.csv')
+    write(path, HEADER + ''.join(sales_lines(200, month=1)))
+    source = InMemorySales.from_csv(path)
+    backend = open_backend(source)
+    assert_matches_cube(backend)
+
+    write(path, ''.join(sales_lines(50, month=2)), 'a')
+    # A new region and a blank segment get labels the database has not seen
+    write(path, "2024-02-21,12.5,Atlantis,Books,,Rep_99,Online\n", 'a')
+    source.refresh()
+    assert_matches_cube(backend)
+    assert stored_version(backend) == source.version()
+
+    write(path, ''.join(sales_lines(5, month=2, seed=1)), 'a')
+    source.refresh()
+    assert_matches_cube(backend)
+
+
+def test_backend_rewrites_cube_for_a_replaced_file(tmp_path, open_backend):
+    path = str(tmp_path / 'sales.csv')
+    write(path, HEADER + ''.join(sales_lines(100)))
+    source = InMemorySales.from_csv(path)
+    backend = open_backend(source)
+    write(path, HEADER + ''.join(sales_lines(30, seed=2)))
+    source.refresh()
+    assert_matches_cube(backend)
+
+
+def test_backend_matches_cube_for_partitions(tmp_path, open_backend):
+    directory = tmp_path / 'sales_data'
+    directory.mkdir()
+    write(str(directory / '2024-01.csv'), HEADER + ''.join(sales_lines(80, month=1)))
+    source = PartitionedSales(str(directory))
+    backend = open_backend(source)
+    write(str(directory / '2024-01.csv'), ''.join(sales_lines(10, month=1, seed=3)), 'a')
+    write(str(directory / '2024-02.csv'), HEADER + ''.join(sales_lines(40, month=2)))
+    source.refresh()
+    assert_matches_cube(backend)
+
+
+def test_sqlite_shared_by_workers_at_different_offsets(tmp_path):
+    path, db = str(tmp_path / 'sales.csv'), str(tmp_path / 'sales.sqlite')
+    write(path, HEADER + ''.join(sales_lines(100)))
+    ahead, behind = InMemorySales.from_csv(path), InMemorySales.from_csv(path)
+    ahead_backend, behind_backend = SQLiteBackend(ahead, db), SQLiteBackend(behind, db)
+
+    write(path, ''.join(sales_lines(20, month=2)), 'a')
+    ahead.refresh()
+    ahead_backend.sync()
+    # The lagging worker keeps the newer cube rather than rewriting it
+    behind_backend._version = None
+    behind_backend.sync()
+    assert stored_version(behind_backend) == ahead.version()
+
+    behind.refresh()
+    assert behind.version() == ahead.version()
+    assert_matches_cube(behind_backend)
+    # The appended rows were inserted once, by whichever worker got there first
+    transactions = behind_backend._connection().execute('SELECT SUM(count) FROM sales_cube').fetchone()[0]
+    assert transactions == 120
@@ -0,0 +1,111 @@
+"""Tests for live sales sources: appended rows must give what a fresh load gives"""
+
+import os
+
+import numpy as np
+import pytest
+
+from sales_source import InMemorySales, PartitionedSales, StreamedSales
+from sales_table import CUBE_DIMENSIONS
+
+HEADER = "Date,Sales,Region,Product_Category,Customer_Segment,Sales_Rep,Channel\n"
+REGIONS = ['North', 'South', 'East', 'West']
+CATEGORIES = ['Books', 'Clothing', 'Electronics']
+
+
+def sales_lines(n, month=1, seed=0):
+    # Few days, so cells get rows from several appends and float sums depend on the batching
+    rng = np.random.default_rng(seed)
+    return [f"2024-{month:02d}-{rng.integers(1, 4):02d},{rng.random() * 1000!r},"
+            f"{REGIONS[rng.integers(4)]},{CATEGORIES[rng.integers(3)]},Premium,"
+            f"Rep_{rng.integers(20)},Online\n" for _ in range(n)]
+
+
+def write(path, text, mode='w'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def rollups(source):
+    """{roll-up: {label: (sales, count)}} of the source's cube, independent of cell and code order"""
+    return {name: {str(label): (round(sales, 6), count) for label, sales, count
+                   in zip(frame.iloc[:, 0], frame['Sales'], frame['Count'])}
+            for name, frame in source.cube().aggregate(CUBE_DIMENSIONS).items()}
+
+
+def assert_same_data(source, fresh):
+    assert rollups(source) == rollups(fresh)
+    assert source.summary['transactions'] == fresh.summary['transactions']
+    assert source.summary['total_sales'] == pytest.approx(fresh.summary['total_sales'])
+    assert source.version() == fresh.version()
+
+
+@pytest.mark.parametrize('open_source', [InMemorySales.from_csv, lambda path: StreamedSales(path, 7)],
+                         ids=['memory', 'streamed'])
+def test_refresh_matches_a_fresh_load(tmp_path, open_source):
+    path = str(tmp_path / 'sales.csv')
+    lines = sales_lines(100)
+    write(path, HEADER + ''.join(lines[:40]))
+    source = open_source(path)
+    for start, end in [(40, 41), (41, 70), (70, 100)]:
+        write(path, ''.join(lines[start:end]), 'a')
+        assert source.refresh() == end - start
+    assert source.refresh() == 0
+    assert_same_data(source, open_source(path))
+    if isinstance(source, InMemorySales):
+        assert len(source.table()) == 100
+
+
+def test_version_does_not_depend_on_append_batching(tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    lines = sales_lines(60)
+    write(path, HEADER + ''.join(lines[:10]))
+    often, once = InMemorySales.from_csv(path), InMemorySales.from_csv(path)
+    for start in range(10, 60, 5):
+        write(path, ''.join(lines[start:start + 5]), 'a')
+        often.refresh()
+    once.refresh()
+    assert_same_data(often, once)
+
+
+def test_partial_last_line_is_read_once_complete(tmp_path):
+    path = str(tmp_path / 'sales.csv')
+    write(path, HEADER + ''.join(sales_lines(10)) + "2024-12-31,500.0,North,Bo")
+    source = InMemorySales.from_csv(path)
+    assert source.summary['transactions'] == 10
+    assert 'Bo' not in source.summary['labels']['Product_Category']
+
+    write(path, "oks,Premium,Rep_1,Online\n", 'a')
+    assert source.refresh() == 1
+    assert source.summary['labels']['Product_Category'].count('Books') == 1
+    assert 'Bo' not in source.summary['labels']['Product_Category']
+    assert_same_data(source, InMemorySales.from_csv(path))
+
+
+@pytest.mark.parametrize('replace', [True, False], ids=['new-file', 'in-place'])
+def test_file_replaced_by_a_larger_one_is_reloaded(tmp_path, replace):
+    path = str(tmp_path / 'sales.csv')
+    write(path, HEADER + ''.join(sales_lines(20, seed=1)))
+    source = InMemorySales.from_csv(path)
+    larger = HEADER + ''.join(sales_lines(50, seed=2))
+    if replace:
+        write(path + '.tmp', larger)
+        os.replace(path + '.tmp', path)
+    else:
+        write(path, larger)
+    source.refresh()
+    assert_same_data(source, InMemorySales.from_csv(path))
+    assert len(source.table()) == 50
+
+
+def test_partitioned_refresh_matches_a_fresh_load(tmp_path):
+    directory = tmp_path / 'sales_data'
+    directory.mkdir()
+    january, february = str(directory / '2024-01.csv'), str(directory / '2024-02.csv')
+    write(january, HEADER + ''.join(sales_lines(30, month=1)))
+    source = PartitionedSales(str(directory))
+    write(january, ''.join(sales_lines(10, month=1, seed=3)), 'a')
+    write(february, HEADER + ''.join(sales_lines(25, month=2)))
+    assert source.refresh() == 35
+    assert_same_data(source, PartitionedSales(str(directory)))
+    assert len(source.table()) == 65
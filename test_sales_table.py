@@ -0,0 +1,43 @@
+"""Regression tests for the integer-coded sales table"""
+
+import io
+
+from data_store import parse_csv
+from sales_source import SALES_CATEGORICAL_COLUMNS, SALES_DATE_COLUMNS
+from sales_table import MISSING_LABEL, SalesTable
+
+BLANK_DIMENSIONS_CSV = """Date,Sales,Region,Product_Category,Customer_Segment,Sales_Rep,Channel
+2024-01-01,100,North,Electronics,Premium,Rep_1,Online
+2024-01-01,50,South,Electronics,,Rep_2,Online
+2024-01-02,25,,Clothing,Standard,Rep_1,Retail
+"""
+
+
+def blank_dimensions_table():
+    frame = parse_csv(io.StringIO(BLANK_DIMENSIONS_CSV), SALES_DATE_COLUMNS, SALES_CATEGORICAL_COLUMNS)
+    return SalesTable.from_frame(frame)
+
+
+def totals(frame, column):
+    return dict(zip(frame[column], frame['Sales']))
+
+
+def test_blank_dimension_values_get_their_own_label():
+    table = blank_dimensions_table()
+    for column in ('Region', 'Customer_Segment'):
+        assert MISSING_LABEL in table.labels(column)
+        assert table.codes[column].min() >= 0
+
+
+def test_blank_dimension_values_aggregate_under_their_own_label():
+    rollups = blank_dimensions_table().rollup().aggregate()
+    assert totals(rollups['Region'], 'Region') == {'North': 100, 'South': 50, MISSING_LABEL: 25}
+    assert totals(rollups['Customer_Segment'], 'Customer_Segment') == \
+        {'Premium': 100, MISSING_LABEL: 50, 'Standard': 25}
+    assert rollups['Date']['Sales'].sum() == 175
+
+
+def test_blank_dimension_values_select_by_label():
+    table = blank_dimensions_table().rollup()
+    assert table.select(equals={'Region': 'South'}).sales.sum() == 50
+    assert table.select(equals={'Region': 'North', 'Customer_Segment': 'Premium'}).sales.sum() == 100